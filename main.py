@@ -3,63 +3,110 @@ import sqlite3
 from datetime import datetime
 import os
 import pandas as pd
-from src.utils import setup_database_and_folders, ingest_to_database, save_to_csv, save_text_notifications
-from src.scraper import extract_district, scrape_data_for_branch, generate_rain_summary, LOCATIONS
+from src.utils import setup_database_and_folders, save_text_notifications, generate_rain_summary
+from src.scraper import extract_district, DAY_LABELS
+from src.delta import version_branch_forecast, summaries_for_versions, change_rows, ingest_changes, day_codes, changed_days as version_changed_days
+from src.batch import ForecastBatch
+from src.providers import get_provider
+from src.spatial import assign_forecast_locations
+from src.export import export_run, parse_export_formats
+from src.writer import SQLiteWriter
+from src.notifications import build_branch_notifications, save_branch_notifications
+from src.alerts import load_rules, run_alerts
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-BRANCHES_FILE = os.path.join(BASE_DIR, "data", "branches", "branches_icool.csv")
+BRANCHES_FILE = os.environ.get("WEATHER_BRANCHES_FILE", os.path.join(BASE_DIR, "data", "branches", "branches_icool.csv"))
 
 branches_df = pd.read_csv(BRANCHES_FILE)
 DB_FILE = "weather_forecasts.db"
+# "accuweather", "open-meteo", or "accuweather+open-meteo" to fetch both concurrently and merge
+FORECAST_PROVIDER = os.environ.get("WEATHER_PROVIDER", "accuweather")
+# "csv", "parquet", "arrow", or several joined by "," (e.g. "csv,parquet")
+EXPORT_FORMATS = parse_export_formats(os.environ.get("WEATHER_EXPORT_FORMATS", "csv"))
+# Per-branch messages go to one JSONL file per run ("jsonl") or the branch_notifications table ("sqlite")
+NOTIFICATION_SINK = os.environ.get("WEATHER_NOTIFICATION_SINK", "jsonl")
+# Alert rules are compiled once; a JSON rules file replaces the built-in ones
+ALERT_RULES = load_rules(os.environ.get("WEATHER_ALERT_RULES"))
+# "1" fetches each branch's forecast from the nearest forecast point by coordinates instead of its
+# address district; every branch that moves to another district's page is logged
+NEAREST_FORECAST_LOCATION = os.environ.get("WEATHER_NEAREST_LOCATION", "0") == "1"
 
 def run_weather_job():
-    print(f"\n--- Running weather job at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---")
+    job_started = datetime.now()
+    print(f"\n--- Running weather job at {job_started.strftime('%Y-%m-%d %H:%M:%S')} ---")
     
     setup_database_and_folders()
     
     # Load branches
     branches_df = pd.read_csv(BRANCHES_FILE)
-    branches_df["district"] = branches_df["address"].apply(extract_district)
+    # Forecasts are fetched for the address district unless nearest-point assignment is enabled;
+    # the address district stays the display label either way
+    branches_df["forecast_location"] = assign_forecast_locations(branches_df, nearest=NEAREST_FORECAST_LOCATION)
+    branches_df["district"] = branches_df["address"].apply(extract_district).fillna(branches_df["forecast_location"])
     
-    all_weather_dataframes = []
+    all_weather_batches = []
     all_summaries = []
+    changed_days = set()
+    scraped_at = datetime.now()
+
+    provider = get_provider(FORECAST_PROVIDER)
+    print(f"Fetching forecasts from: {provider.name}")
+    sources = provider.fetch(branches_df)
     
-    with sqlite3.connect(DB_FILE) as conn:
-        for _, branch_row in branches_df.iterrows():
-            district = branch_row["district"]
-            if district not in LOCATIONS:
-                print(f"Skipping branch {branch_row['branch']} - district not in LOCATIONS list: {district}")
-                continue
-            
-            print(f"\n--- Processing branch: {branch_row['branch']} ({district}) ---")
-            try:
-                df = scrape_data_for_branch(branch_row, LOCATIONS[district])
-                if df.empty:
-                    print(f"No data scraped for {branch_row['branch']}. Skipping.")
+    # Reads (previous versions) use conn; all writes (forecasts, branch notifications, alerts)
+    # go through the single writer thread
+    with SQLiteWriter(DB_FILE) as writer:
+        with sqlite3.connect(DB_FILE) as conn:
+            for branch_id, branch_row in branches_df.iterrows():
+                district = branch_row["district"]
+                if branch_id not in sources:
+                    print(f"Skipping branch {branch_row['branch']} - no forecast from {provider.name} ({district})")
                     continue
+            
+                print(f"\n--- Processing branch: {branch_row['branch']} ({district}) ---")
+                try:
+                    batch, versions = version_branch_forecast(conn, branch_row, sources[branch_id], scraped_at)
+                    if not len(batch):
+                        print(f"No data scraped for {branch_row['branch']}. Skipping.")
+                        continue
 
-                summaries = generate_rain_summary(df)
-                ingest_to_database(conn, df, summaries)
+                    # Only days whose forecast changed get new summaries and new rows, so only those
+                    # days are materialized (with branch metadata attached) for this branch
+                    summaries = summaries_for_versions(conn, batch, branches_df, versions, generate_rain_summary)
+                    branch_changed_days = version_changed_days(versions)
+                    df = batch.select_days(day_codes(branch_changed_days)).to_frame(branches_df)
+                    writer.submit(ingest_changes, *change_rows(df, summaries, versions, scraped_at))
+                    changed_days |= branch_changed_days
+                    if not branch_changed_days:
+                        print("  Forecast unchanged since the last scrape.")
 
-                all_weather_dataframes.append(df)
-                all_summaries.extend(summaries)
+                    all_weather_batches.append(batch)
+                    all_summaries.extend(summaries)
 
-                for summary in summaries:
-                    print(f"  -> {summary['summary_text']}")
+                    for summary in summaries:
+                        print(f"  -> {summary['summary_text']}")
 
-            except Exception as e:
-                print(f"[CRITICAL ERROR] Failed to process {branch_row['branch']} ({district}). Reason: {e}")
-    
-    if all_weather_dataframes:
-        final_weather_df = pd.concat(all_weather_dataframes, ignore_index=True)
-        save_to_csv(final_weather_df, all_summaries)
+                except Exception as e:
+                    print(f"[CRITICAL ERROR] Failed to process {branch_row['branch']} ({district}). Reason: {e}")
+
+        if all_weather_batches and not changed_days:
+            print("No forecast changed since the last scrape, skipping export and notifications.")
+        elif all_weather_batches:
+            final_weather_df = ForecastBatch.concat(all_weather_batches).to_frame(branches_df)
+            export_run(final_weather_df, all_summaries, scraped_at, EXPORT_FORMATS)
+            save_branch_notifications(build_branch_notifications(final_weather_df), scraped_at, NOTIFICATION_SINK, DB_FILE, writer)
+            # Only districts/days whose rows changed are re-evaluated
+            for alert in run_alerts(DB_FILE, ["forecast"], ALERT_RULES, final_weather_df, writer)["message"]:
+                print(f"  -> {alert}")
         
-        # This call passes the full dataset to the report generator
-        save_text_notifications(final_weather_df, all_summaries) 
-    else:
-        print("No data collected, skipping CSV export and notifications.")
+            # The notification only covers today, so it only needs rebuilding when today changed
+            if DAY_LABELS[1] in changed_days:
+                save_text_notifications(final_weather_df, all_summaries)
+        else:
+            print("No data collected, skipping export and notifications.")
 
-    print("\n--- Job finished successfully. ---")
+    print(f"\nDatabase writes: {writer.format_metrics()}")
+    print(f"\n--- Job finished successfully in {(datetime.now() - job_started).total_seconds():.1f}s. ---")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,340 @@
+# alerts.py
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.conditions import classify_weathercodes, with_conditions
+from src.utils import DB_FILE, consecutive_hour_ranges, query_latest_forecast, sql_rows
+from src.writer import SQLiteWriter
+
+# --- CONFIGURATION ---
+OPENING_HOURS = [10, 23]         # hours the branches receive guests
+NOWCAST_WINDOW_HOURS = 24        # nowcast intervals considered per evaluation
+ALERTS_TIMEZONE = "Asia/Ho_Chi_Minh"
+
+# Rules are plain data (and can be loaded from a JSON file with the same shape):
+#   source   "forecast" (hourly scraped forecast) or "nowcast" (15-minute intervals)
+#   when     {field: [operator, value]}; every condition must hold
+#   peak     optional numeric field whose maximum is reported with the alert
+#   message  template with {branch}, {district}, {period}, {hours} and {peak}
+DEFAULT_RULES = [
+    {"name": "rain_opening_hours", "source": "forecast", "severity": "warning",
+     "when": {"rain_intensity": [">=", 1], "hour": ["between", OPENING_HOURS]},
+     "message": "{branch} ({district}) {period}: Mưa trong giờ đón khách {hours}."},
+    {"name": "heavy_rain_forecast", "source": "forecast", "severity": "warning",
+     "when": {"rain_intensity": [">=", 3]},
+     "message": "{branch} ({district}) {period}: Mưa to {hours}."},
+    {"name": "high_temperature", "source": "forecast", "severity": "info", "peak": "temperature",
+     "when": {"temperature": [">=", 35]},
+     "message": "{branch} ({district}) {period}: Nắng nóng, nhiệt độ tới {peak:g}° ({hours})."},
+    {"name": "high_uv", "source": "forecast", "severity": "info", "peak": "uv_index",
+     "when": {"uv_index": [">=", 8]},
+     "message": "{branch} ({district}) {period}: Chỉ số UV tới {peak:g} ({hours})."},
+    {"name": "heavy_rain_15min", "source": "nowcast", "severity": "warning", "peak": "precipitation",
+     "when": {"precipitation": [">=", 2.5]},
+     "message": "{branch} {period}: Mưa lớn {peak:g} mm trong 15 phút."},
+]
+
+# Per source: the fields rules may use, the columns whose changes trigger re-evaluation and the
+# group a change is tracked at: one fingerprint per branch and forecast day, or per branch and
+# nowcast date (a day's intervals share one alert_inputs row).
+# condition and rain_intensity (0 none .. 3 heavy) come from src.conditions for both sources.
+SOURCES = {
+    "forecast": {
+        "numeric": ["hour", "temperature", "humidity", "uv_index", "rain_intensity"],
+        "text": ["content", "wind", "condition"],
+        "group": ["branch", "forecast_day"], "period": "forecast_day",
+    },
+    "nowcast": {
+        "numeric": ["hour", "temperature_2m", "relativehumidity_2m", "precipitation", "weathercode", "windspeed_10m",
+                    "rain_intensity"],
+        "text": ["weather_condition", "condition"],
+        "group": ["branch", "interval_date"], "period": "interval_start",
+    },
+}
+
+ALERT_COLUMNS = ["source", "rule", "severity", "branch", "district", "period", "hours", "peak", "message"]
+
+# --- RULE COMPILATION ---
+
+NUMERIC_OPERATORS = {
+    ">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal,
+    "==": np.equal, "!=": np.not_equal,
+    "between": lambda x, v: (x >= v[0]) & (x <= v[1]),
+    "in": lambda x, v: np.isin(x, v),
+}
+
+def _text_condition(field, op, value):
+    """Text conditions are evaluated once per distinct value (category) and looked up by code."""
+    if op == "matches":
+        pattern = "|".join(value if isinstance(value, list) else [value])
+        test = lambda categories: categories.str.contains(pattern, case=False, regex=True)
+    elif op in ("==", "in"):
+        values = set(value if isinstance(value, list) else [value])
+        test = lambda categories: categories.isin(values)
+    else:
+        raise ValueError(f"Operator '{op}' is not supported for text field '{field}'.")
+
+    def condition(frame):
+        column = frame[field]
+        hits = np.append(np.asarray(test(column.cat.categories), dtype=bool), False)
+        return hits[column.cat.codes.to_numpy()]
+    return condition
+
+def _numeric_condition(field, op, value):
+    if op not in NUMERIC_OPERATORS:
+        raise ValueError(f"Operator '{op}' is not supported for numeric field '{field}'.")
+    operator = NUMERIC_OPERATORS[op]
+    return lambda frame: np.asarray(operator(frame[field].to_numpy(dtype=float), value), dtype=bool)
+
+class AlertRule:
+    """A compiled rule: its conditions are closures over column arrays, built once."""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.source = spec.get("source", "forecast")
+        if self.source not in SOURCES:
+            raise ValueError(f"Rule '{self.name}': unknown source '{self.source}'.")
+        fields = SOURCES[self.source]
+        self.severity = spec.get("severity", "warning")
+        self.peak = spec.get("peak")
+        if self.peak is not None and self.peak not in fields["numeric"]:
+            raise ValueError(f"Rule '{self.name}': peak field '{self.peak}' is not numeric.")
+        self.render = spec.get("message", "{branch} ({district}) {period}: " + self.name + " {hours}.").format
+        self.conditions = []
+        for field, (op, value) in spec["when"].items():
+            if field in fields["numeric"]:
+                self.conditions.append(_numeric_condition(field, op, value))
+            elif field in fields["text"]:
+                self.conditions.append(_text_condition(field, op, value))
+            else:
+                raise ValueError(f"Rule '{self.name}': unknown {self.source} field '{field}'.")
+
+    def mask(self, frame):
+        result = np.ones(len(frame), dtype=bool)
+        for condition in self.conditions:
+            result &= condition(frame)
+        return result
+
+class RuleSet:
+    """All rules compiled once; the hash invalidates stored evaluations when the rules change."""
+
+    def __init__(self, rules):
+        self.specs = rules
+        self.rules = [AlertRule(spec) for spec in rules]
+        self.hash = hashlib.sha1(json.dumps(rules, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+    def for_source(self, source):
+        return [rule for rule in self.rules if rule.source == source]
+
+def load_rules(path=None):
+    """Rules from a JSON file (a list shaped like DEFAULT_RULES), or the defaults."""
+    if not path:
+        return RuleSet(DEFAULT_RULES)
+    with open(path, encoding="utf-8") as f:
+        return RuleSet(json.load(f))
+
+# --- FRAMES ---
+
+def _parse_numbers(series):
+    """Leading numbers of text values ("32°", "70%", "7 (Cao)"), parsed once per distinct value."""
+    codes, values = pd.factorize(series.astype(str))
+    parsed = pd.to_numeric(pd.Series(values).str.extract(r"(-?\d+(?:\.\d+)?)", expand=False), errors="coerce")
+    return np.append(parsed.to_numpy(dtype=float), np.nan)[codes]
+
+def forecast_frame(weather_df):
+    """The scraped hourly frame with numeric hour/temperature/humidity/UV, categorical text and the phrase's condition."""
+    df = with_conditions(weather_df)[["branch", "district", "forecast_day", "hour", "temperature", "content", "wind",
+                                      "humidity", "uv_index", "condition", "rain_intensity"]].copy()
+    for column in ["hour", "temperature", "humidity", "uv_index"]:
+        df[column] = _parse_numbers(df[column])
+    for column in ["content", "wind", "condition"]:
+        df[column] = df[column].astype("category")
+    df["district"] = df["district"].fillna("")
+    return df.reset_index(drop=True)
+
+def load_nowcast_frame(conn, now=None, window_hours=NOWCAST_WINDOW_HOURS):
+    """Stored 15-minute intervals of the last `window_hours` hours."""
+    now = now or pd.Timestamp.now(tz=ALERTS_TIMEZONE).tz_localize(None).to_pydatetime()
+    has_table = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'nowcast_15min'").fetchone()
+    if not has_table:
+        return pd.DataFrame(columns=["branch", "district", "interval_start", "interval_date"] + SOURCES["nowcast"]["numeric"]
+                            + SOURCES["nowcast"]["text"])
+    since = (now - timedelta(hours=window_hours)).strftime("%Y-%m-%d %H:%M")
+    df = pd.read_sql_query("SELECT * FROM nowcast_15min WHERE interval_start >= ?", conn, params=[since])
+    df["hour"] = pd.to_numeric(df["interval_start"].str.slice(11, 13), errors="coerce")
+    df["interval_date"] = df["interval_start"].str.slice(0, 10)
+    df["weather_condition"] = df["weather_condition"].astype("category")
+    df["district"] = ""
+    categories = classify_weathercodes(df["weathercode"])
+    return df.assign(condition=categories["condition"], rain_intensity=categories["rain_intensity"])
+
+# --- STORAGE ---
+
+def setup_alert_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            source TEXT NOT NULL, rule TEXT NOT NULL, branch TEXT NOT NULL, period TEXT NOT NULL,
+            group_key TEXT NOT NULL, severity TEXT, district TEXT, hours TEXT, peak REAL, message TEXT,
+            evaluated_at TIMESTAMP,
+            PRIMARY KEY (source, rule, branch, period)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_alerts_group ON alerts (source, group_key)')
+    # Fingerprint of each group's input rows at its last evaluation
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alert_inputs (
+            source TEXT NOT NULL, group_key TEXT NOT NULL, fingerprint TEXT, evaluated_at TIMESTAMP,
+            PRIMARY KEY (source, group_key)
+        ) WITHOUT ROWID
+    ''')
+
+def _group_fingerprints(frame, source, ruleset):
+    """
+    (row group ids, group keys, fingerprints): a SHA-1 over each group's sorted row hashes, so row
+    order doesn't matter and, unlike an XOR, identical rows don't cancel each other out.
+    """
+    spec = SOURCES[source]
+    grouped = frame.groupby(spec["group"], sort=False)
+    codes = grouped.ngroup().to_numpy()
+    keys = ["|".join(map(str, group)) for group in grouped.size().index]    # same order as ngroup()
+    columns = [c for c in ["branch", "district", spec["period"]] + spec["numeric"] + spec["text"] if c in frame]
+    row_hashes = pd.util.hash_pandas_object(frame[columns], index=False).to_numpy()
+    order = np.lexsort((row_hashes, codes))
+    sorted_hashes = row_hashes[order]
+    bounds = np.r_[np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0]), len(order)]
+    fingerprints = [f"{ruleset.hash}:{hashlib.sha1(sorted_hashes[start:end].tobytes()).hexdigest()}"
+                    for start, end in zip(bounds[:-1], bounds[1:])]
+    return codes, keys, fingerprints
+
+def _evaluate(frame, source, rules):
+    """Every rule over all rows at once; matches are grouped per (branch, period) into one alert."""
+    spec = SOURCES[source]
+    results = []
+    for rule in rules:
+        matched = frame[rule.mask(frame)]
+        if matched.empty:
+            continue
+        grouped = matched.groupby(["branch", spec["period"]], sort=False)
+        alert_ids = grouped.ngroup().to_numpy()
+        alerts = grouped.agg(district=("district", "first"), group_key=("group_key", "first")).reset_index()
+        alerts = alerts.rename(columns={spec["period"]: "period"})
+        # Rows without an hour still raise the alert but are left out of its hour ranges
+        hours = matched["hour"].to_numpy(dtype=float)
+        has_hour = ~np.isnan(hours)
+        run_ids, labels = consecutive_hour_ranges(alert_ids[has_hour], hours[has_hour].astype(np.int64))
+        hours_text = np.full(len(alerts), "", dtype=object)
+        if len(run_ids):
+            firsts = np.flatnonzero(np.r_[True, run_ids[1:] != run_ids[:-1]])
+            hours_text[run_ids[firsts]] = [text[2:] for text in np.add.reduceat(", " + labels, firsts)]
+        alerts["hours"] = hours_text
+        alerts["peak"] = (pd.Series(matched[rule.peak].to_numpy(dtype=float)).groupby(alert_ids).max().to_numpy()
+                          if rule.peak else np.nan)
+        alerts["message"] = [rule.render(branch=b, district=d, period=p, hours=h, peak=k)
+                             for b, d, p, h, k in alerts[["branch", "district", "period", "hours", "peak"]].itertuples(index=False)]
+        results.append(alerts.assign(source=source, rule=rule.name, severity=rule.severity))
+    if not results:
+        return pd.DataFrame(columns=ALERT_COLUMNS + ["group_key"])
+    return pd.concat(results, ignore_index=True)[ALERT_COLUMNS + ["group_key"]]
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+def store_alerts(conn, source, alert_rows, evaluated, stale_keys, stamp):
+    """
+    Replaces the stored alerts of the re-evaluated groups and records their fingerprints, and drops
+    alerts and fingerprints of `stale_keys` (groups no longer in the source's input).
+    `alert_rows` are (ALERT_COLUMNS..., group_key) tuples and `evaluated` is a list of
+    (group_key, fingerprint). No commit; runs as a SQLiteWriter job.
+    """
+    setup_alert_tables(conn)
+    removed = [(source, k) for k, _ in evaluated] + [(source, k) for k in stale_keys]
+    conn.executemany("DELETE FROM alerts WHERE source = ? AND group_key = ?", removed)
+    conn.executemany("DELETE FROM alert_inputs WHERE source = ? AND group_key = ?", [(source, k) for k in stale_keys])
+    conn.executemany('''
+        INSERT OR REPLACE INTO alerts (source, rule, severity, branch, district, period, hours, peak, message,
+                                       group_key, evaluated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(*row, stamp) for row in alert_rows])
+    conn.executemany('''
+        INSERT INTO alert_inputs (source, group_key, fingerprint, evaluated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (source, group_key) DO UPDATE SET fingerprint = excluded.fingerprint, evaluated_at = excluded.evaluated_at
+    ''', [(source, k, fp, stamp) for k, fp in evaluated])
+
+def evaluate_alerts(conn, source, frame, ruleset, writer):
+    """
+    Re-evaluates the source's rules only for groups (a branch's forecast day or nowcast date)
+    whose input rows changed since their last evaluation; groups that are no longer in `frame` lose
+    their stored alerts. Previous fingerprints are read from `conn`; the writes are submitted to
+    `writer` (a SQLiteWriter).
+    Returns (alerts raised for the changed groups, number of groups, number re-evaluated).
+    """
+    rules = ruleset.for_source(source)
+    if not rules:
+        return pd.DataFrame(columns=ALERT_COLUMNS), 0, 0
+
+    previous = {}
+    if _table_exists(conn, "alert_inputs"):
+        previous = dict(conn.execute("SELECT group_key, fingerprint FROM alert_inputs WHERE source = ?", (source,)))
+    codes, keys, fingerprints = _group_fingerprints(frame, source, ruleset) if not frame.empty else ([], [], [])
+    changed = np.array([previous.get(k) != fp for k, fp in zip(keys, fingerprints)], dtype=bool)
+    stale_keys = sorted(set(previous) - set(keys))
+    if not changed.any() and not stale_keys:
+        return pd.DataFrame(columns=ALERT_COLUMNS), len(keys), 0
+
+    alerts = pd.DataFrame(columns=ALERT_COLUMNS + ["group_key"])
+    if changed.any():
+        rows = frame[changed[codes]].assign(group_key=np.asarray(keys, dtype=object)[codes[changed[codes]]])
+        alerts = _evaluate(rows, source, rules)
+
+    evaluated = [(k, fp) for k, fp, c in zip(keys, fingerprints, changed) if c]
+    writer.submit(store_alerts, source, sql_rows(alerts, ALERT_COLUMNS + ["group_key"]), evaluated, stale_keys,
+                  datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    return alerts[ALERT_COLUMNS], len(keys), int(changed.sum())
+
+def run_alerts(db_file=DB_FILE, sources=("forecast", "nowcast"), ruleset=None, weather_df=None, writer=None):
+    """
+    Evaluates alerts for the given sources. The forecast frame is `weather_df` when given
+    (the job's in-memory result), otherwise the latest stored forecast. Writes go to `writer`,
+    or to a SQLiteWriter opened (and flushed) for this call.
+    """
+    ruleset = ruleset or load_rules(os.environ.get("WEATHER_ALERT_RULES"))
+    if writer is None:
+        with SQLiteWriter(db_file) as own_writer:
+            return run_alerts(db_file, sources, ruleset, weather_df, own_writer)
+    raised = []
+    with closing(sqlite3.connect(db_file)) as conn:
+        for source in sources:
+            if source == "forecast":
+                if weather_df is None:
+                    weather_df = query_latest_forecast(conn)
+                frame = forecast_frame(weather_df) if not weather_df.empty else pd.DataFrame()
+            else:
+                frame = load_nowcast_frame(conn)
+            alerts, n_groups, n_changed = evaluate_alerts(conn, source, frame, ruleset, writer)
+            print(f"  Alerts ({source}): re-evaluated {n_changed} of {n_groups} groups, {len(alerts)} alerts raised.")
+            raised.append(alerts)
+    raised = [a for a in raised if not a.empty]
+    return pd.concat(raised, ignore_index=True) if raised else pd.DataFrame(columns=ALERT_COLUMNS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate declarative weather alert rules incrementally.")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file")
+    parser.add_argument("--source", choices=["forecast", "nowcast", "all"], default="all")
+    parser.add_argument("--rules", default=os.environ.get("WEATHER_ALERT_RULES"), help="JSON rules file (default: built-in rules)")
+    args = parser.parse_args()
+
+    sources = ["forecast", "nowcast"] if args.source == "all" else [args.source]
+    alerts = run_alerts(args.db, sources, load_rules(args.rules))
+    for message in alerts["message"]:
+        print(f"  -> {message}")
+
+if __name__ == "__main__":
+    main()
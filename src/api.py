@@ -0,0 +1,261 @@
+# api.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from src.utils import DB_FILE, DAY_LABELS, generate_dynamic_report, query_latest_forecast
+from src.weather_scraper import BRANCH_CSV_PATH, compare_rainfall, format_rainfall_comparison
+
+# --- CONFIGURATION ---
+API_HOST = "127.0.0.1"
+API_PORT = 8000
+CACHE_MAX_ENTRIES = 512
+CACHE_TTL_SECONDS = 300
+VERSION_CHECK_SECONDS = 5    # the data version is stat'ed at most this often, not on every request
+
+SUMMARY_COLUMNS = ['scraped_at', 'branch', 'address', 'latitude', 'longitude', 'district',
+                   'forecast_day', 'summary_text']
+
+# --- CACHE ---
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    The whole cache is dropped when the data version (see data_version) changes; the version is
+    checked at most once per `version_check` seconds.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, version_check=VERSION_CHECK_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_check = version_check
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def sync_version(self, get_version):
+        """Invalidates every entry if get_version() changed since the last check; between checks this is a no-op."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.version_check
+        version = get_version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "max_entries": self.max_entries, "ttl_seconds": self.ttl}
+
+
+def data_version(db_file=DB_FILE):
+    """
+    A cheap fingerprint of the DB: the mtime and size of the DB file and its WAL. A new scrape
+    changes it. The report files behind /rainfall are only refreshed by the TTL.
+    """
+    version = []
+    for path in (db_file, db_file + "-wal"):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+# --- QUERIES ---
+
+_local = threading.local()
+
+class BadRequest(ValueError):
+    """Invalid query parameters; answered with a 400."""
+
+def _get_connection(db_file=DB_FILE):
+    """One read-only connection per server thread."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "db_file", None) != db_file:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False)
+        _local.conn, _local.db_file = conn, db_file
+    return conn
+
+def _day_code(day):
+    """Accepts a day code ("1") or a label ("hôm nay"); anything else is a BadRequest."""
+    if day is None:
+        return None
+    if day.isdigit() and int(day) in DAY_LABELS:
+        return int(day)
+    for code, label in DAY_LABELS.items():
+        if day == label:
+            return code
+    raise BadRequest(f"Invalid day '{day}'. Use one of {', '.join(map(str, DAY_LABELS))} "
+                     f"or {', '.join(DAY_LABELS.values())}.")
+
+def _day_label(day):
+    code = _day_code(day)
+    return DAY_LABELS[code] if code is not None else None
+
+def query_latest_summaries(conn, branch=None, district=None, day=None, today=None):
+    """Rain summaries from the most recent stored scrape of each branch and forecast day (today's scrapes only, like query_latest_forecast)."""
+    sql = f'''
+        SELECT {", ".join("s." + c for c in SUMMARY_COLUMNS)} FROM daily_summaries s
+        JOIN (SELECT branch, forecast_day, MAX(scraped_at) AS latest FROM daily_summaries
+              WHERE scraped_at >= ? GROUP BY branch, forecast_day) m
+          ON s.branch = m.branch AND s.forecast_day = m.forecast_day AND s.scraped_at = m.latest
+        WHERE 1 = 1
+    '''
+    params = [(today or date.today()).isoformat()]
+    if branch:
+        sql += " AND s.branch = ?"
+        params.append(branch)
+    if district:
+        sql += " AND s.district = ?"
+        params.append(district)
+    if day:
+        sql += " AND s.forecast_day = ?"
+        params.append(day)
+    sql += " ORDER BY s.branch, s.id"
+    return pd.read_sql_query(sql, conn, params=params)
+
+# --- ENDPOINTS ---
+# Each endpoint returns (json_payload, text_payload); the handler picks one by ?format=
+
+def _df_text(df):
+    return df.to_string(index=False) if not df.empty else "Không có dữ liệu."
+
+def endpoint_forecast(conn, params):
+    df = query_latest_forecast(conn, params.get("branch"), params.get("district"), _day_label(params.get("day")))
+    return df.to_dict(orient="records"), _df_text(df)
+
+def endpoint_summary(conn, params):
+    df = query_latest_summaries(conn, params.get("branch"), params.get("district"), _day_label(params.get("day")))
+    return df.to_dict(orient="records"), "\n".join(df["summary_text"]) if not df.empty else _df_text(df)
+
+def endpoint_report(conn, params):
+    """The dynamic (district-grouped) report; ?day=1..3, or all three days when omitted."""
+    df = query_latest_forecast(conn)
+    day = _day_code(params.get("day"))
+    days = [day] if day is not None else list(DAY_LABELS)
+    reports = {DAY_LABELS[day]: generate_dynamic_report(df, forecast_day=day) for day in days}
+    return reports, "\n\n".join(reports.values())
+
+def endpoint_rainfall(conn, params):
+    """Today vs. historical rainfall comparison per branch (all branches when ?branch= is omitted)."""
+    if params.get("branch"):
+        branches = [params["branch"]]
+    else:
+        branches = pd.read_csv(BRANCH_CSV_PATH)["branch"].tolist()
+    results = [r for r in (compare_rainfall(b) for b in branches) if r is not None]
+    text = "\n\n".join(f"{r['branch']}\n{format_rainfall_comparison(r)}" for r in results)
+    return results, text or "Không có dữ liệu."
+
+ENDPOINTS = {
+    "/forecast": endpoint_forecast,
+    "/summary": endpoint_summary,
+    "/report": endpoint_report,
+    "/rainfall": endpoint_rainfall,
+}
+
+# --- SERVER ---
+
+class WeatherAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients don't reconnect per request
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    cache = TTLCache()
+    db_file = DB_FILE
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        fmt = "text" if params.pop("format", "json") == "text" else "json"
+
+        if url.path == "/health":
+            return self._send(200, json.dumps({"status": "ok", "cache": self.cache.stats()}).encode("utf-8"), "json")
+
+        endpoint = ENDPOINTS.get(url.path)
+        if endpoint is None:
+            return self._send(404, json.dumps({"error": f"Unknown path {url.path}"}).encode("utf-8"), "json")
+
+        self.cache.sync_version(lambda: data_version(self.db_file))
+        key = (url.path, fmt, tuple(sorted(params.items())))
+        body = self.cache.get(key)
+        if body is None:
+            try:
+                json_payload, text_payload = endpoint(_get_connection(self.db_file), params)
+            except BadRequest as e:
+                return self._send(400, json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8"), "json")
+            except (sqlite3.Error, ValueError, KeyError) as e:
+                return self._send(500, json.dumps({"error": str(e)}).encode("utf-8"), "json")
+            if fmt == "text":
+                body = text_payload.encode("utf-8")
+            else:
+                body = json.dumps(json_payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.cache.set(key, body)
+        self._send(200, body, fmt)
+
+    def _send(self, status, body, fmt):
+        self.send_response(status)
+        content_type = "text/plain" if fmt == "text" else "application/json"
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging to stderr costs more than a cache hit; stay quiet.
+        pass
+
+def create_server(host=API_HOST, port=API_PORT, db_file=DB_FILE):
+    """Builds (but does not start) the HTTP server with a fresh cache."""
+    handler = type("ConfiguredWeatherAPIHandler", (WeatherAPIHandler,), {"cache": TTLCache(), "db_file": db_file})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    server = create_server()
+    print(f"Serving weather API on http://{API_HOST}:{API_PORT} "
+          f"(endpoints: {', '.join(ENDPOINTS)}, /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping weather API.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# backfill.py
+import argparse
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from src.utils import DB_FILE, sql_rows
+from src.writer import SQLiteWriter
+from src.weather_scraper import BRANCH_CSV_PATH, HISTORICAL_HOURLY_VARIABLES, fetch_historical_weather
+
+# --- CONFIGURATION ---
+BACKFILL_DAYS = 720
+CHUNK_DAYS = 90
+WORKERS = 4
+REQUESTS_PER_SECOND = 5.0    # Open-Meteo's free tier allows ~600 calls/minute; stay well below
+CHUNK_EPOCH = date(2000, 1, 1)  # chunks are aligned to this date so re-runs produce the same chunks
+ARCHIVE_LAG_DAYS = 5         # the archive serves the most recent days as nulls until they are filled in
+
+HISTORICAL_COLUMNS = ["branch", "datetime"] + HISTORICAL_HOURLY_VARIABLES + ["weather_condition"]
+
+# --- STORAGE ---
+
+def setup_backfill_tables(conn):
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS historical_hourly (
+            branch TEXT NOT NULL, datetime TIMESTAMP NOT NULL,
+            {", ".join(f"{v} REAL" for v in HISTORICAL_HOURLY_VARIABLES)},
+            weather_condition TEXT,
+            PRIMARY KEY (branch, datetime)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS backfill_chunks (
+            branch TEXT NOT NULL, chunk_start DATE NOT NULL, chunk_end DATE NOT NULL,
+            rows INTEGER, completed_at TIMESTAMP,
+            PRIMARY KEY (branch, chunk_start, chunk_end)
+        )
+    ''')
+
+def completed_chunks(conn):
+    return {(b, s, e) for b, s, e in conn.execute("SELECT branch, chunk_start, chunk_end FROM backfill_chunks")}
+
+def chunk_rows(branch, df):
+    """A fetched chunk as historical_hourly parameter rows; built by the fetching worker, not the writer."""
+    return sql_rows(df.assign(branch=branch, datetime=df["datetime"].dt.strftime("%Y-%m-%d %H:%M")), HISTORICAL_COLUMNS)
+
+def chunk_complete(df):
+    """False when the chunk's last hour has no precipitation yet (it reaches into the archive's lag)."""
+    return bool(df["precipitation"].notna().iloc[-1])
+
+def store_chunk(conn, branch, chunk_start, chunk_end, rows, checkpoint=True):
+    """
+    Writes one chunk (chunk_rows()) and, when `checkpoint`, its checkpoint. Runs as one SQLiteWriter
+    job, so both land in the same transaction and a crash never half-records a chunk. Incomplete
+    chunks are stored without a checkpoint, so the next run fetches them again and fills the nulls.
+    """
+    conn.executemany(
+        f"INSERT OR REPLACE INTO historical_hourly ({', '.join(HISTORICAL_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(HISTORICAL_COLUMNS))})", rows)
+    if not checkpoint:
+        return
+    conn.execute("INSERT OR REPLACE INTO backfill_chunks VALUES (?, ?, ?, ?, ?)",
+                 (branch, chunk_start, chunk_end, len(rows), datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+# --- PLANNING ---
+
+def plan_chunks(start, end, chunk_days=CHUNK_DAYS):
+    """
+    Splits [start, end] into (chunk_start, chunk_end) ISO date pairs aligned to CHUNK_EPOCH. Aligned
+    chunks stay identical between runs; only the last, partial chunk changes as `end` moves.
+    """
+    chunks = []
+    offset = (start - CHUNK_EPOCH).days // chunk_days
+    chunk_start = CHUNK_EPOCH + timedelta(days=offset * chunk_days)
+    while chunk_start <= end:
+        chunk_end = chunk_start + timedelta(days=chunk_days - 1)
+        chunks.append((max(chunk_start, start).isoformat(), min(chunk_end, end).isoformat()))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+class RateLimiter:
+    """Spaces out calls from any number of threads to at most `rate` per second."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND):
+        if not rate > 0:
+            raise ValueError(f"Rate must be a positive number of requests per second, got {rate}.")
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+# --- MAIN WORKFLOW ---
+
+def run_backfill(locations_df, start, end, db_file=DB_FILE, chunk_days=CHUNK_DAYS,
+                 workers=WORKERS, rate=REQUESTS_PER_SECOND):
+    """
+    Fetches hourly history for every branch in chunks, concurrently under a rate limit. Completed
+    chunks are checkpointed in backfill_chunks and skipped on the next run, so an interrupted backfill
+    resumes where it stopped. Workers hand each chunk straight to the writer thread; only the chunks
+    in flight or queued for writing are held in memory.
+    """
+    print(f"\n--- Starting Historical Backfill {start} to {end} ({chunk_days}-day chunks) ---")
+    limiter = RateLimiter(rate)
+    with sqlite3.connect(db_file) as conn:
+        setup_backfill_tables(conn)
+        done = completed_chunks(conn)
+    conn.close()
+    tasks = [(row['branch'], row['latitude'], row['longitude'], chunk_start, chunk_end)
+             for _, row in locations_df.iterrows()
+             for chunk_start, chunk_end in plan_chunks(start, end, chunk_days)
+             if (row['branch'], chunk_start, chunk_end) not in done]
+    print(f"{len(tasks)} chunks to fetch ({len(done)} already checkpointed).")
+
+    with SQLiteWriter(db_file, max_queue=workers * 2) as writer:
+        def fetch_and_store(task):
+            branch, lat, lon, chunk_start, chunk_end = task
+            limiter.wait()
+            df = fetch_historical_weather(lat, lon, chunk_start, chunk_end)
+            if df is None or df.empty:
+                return None
+            complete = chunk_complete(df)
+            # blocks while the writer is behind
+            writer.submit(store_chunk, branch, chunk_start, chunk_end, chunk_rows(branch, df), complete)
+            return len(df), complete
+
+        stored = failed = 0
+        pending = {}
+        task_iter = iter(tasks)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # Keep a bounded number of chunks in flight so memory doesn't grow with the range
+                while len(pending) < workers * 2:
+                    task = next(task_iter, None)
+                    if task is None:
+                        break
+                    pending[pool.submit(fetch_and_store, task)] = task
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    branch, _, _, chunk_start, chunk_end = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Not checkpointed, so the chunk is fetched again on the next run
+                        failed += 1
+                        print(f"  [ERROR] {branch} {chunk_start} to {chunk_end} failed ({e}); it will be retried on the next run.")
+                        continue
+                    if result is None:
+                        failed += 1
+                        print(f"  Failed {branch} {chunk_start} to {chunk_end}; it will be retried on the next run.")
+                        continue
+                    n_rows, complete = result
+                    stored += 1
+                    print(f"-> {branch}: queued {n_rows} rows for {chunk_start} to {chunk_end}"
+                          + ("" if complete else " (trailing hours not in the archive yet; not checkpointed)"))
+    print(f"Database writes: {writer.format_metrics()}")
+    print(f"--- Backfill finished: {stored} chunks fetched, {failed} failed. ---")
+
+def _positive(convert):
+    def parse(text):
+        value = convert(text)
+        if not value > 0:
+            raise argparse.ArgumentTypeError(f"must be greater than 0, got {text}")
+        return value
+    return parse
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable, chunked parallel backfill of hourly weather history.")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file")
+    parser.add_argument("--days", type=int, default=BACKFILL_DAYS, help="days of history ending at --end")
+    parser.add_argument("--start", type=date.fromisoformat, help="start date (overrides --days)")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today() - timedelta(days=ARCHIVE_LAG_DAYS),
+                        help=f"end date (default: {ARCHIVE_LAG_DAYS} days ago, the newest day the archive has filled in)")
+    parser.add_argument("--chunk-days", type=_positive(int), default=CHUNK_DAYS)
+    parser.add_argument("--workers", type=_positive(int), default=WORKERS)
+    parser.add_argument("--rate", type=_positive(float), default=REQUESTS_PER_SECOND, help="max requests per second")
+    args = parser.parse_args()
+    start = args.start or args.end - timedelta(days=args.days)
+    run_backfill(pd.read_csv(BRANCH_CSV_PATH), start, args.end, args.db, args.chunk_days, args.workers, args.rate)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# batch.py
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.conditions import CONDITIONS, classify_phrase, lookup_tables
+from src.scraper import DAY_LABELS
+
+BRANCH_COLUMNS = ["branch", "address", "latitude", "longitude", "district"]
+FRAME_COLUMNS = BRANCH_COLUMNS + ["forecast_day", "hour", "temperature", "content", "wind", "humidity", "uv_index",
+                                  "condition", "rain_intensity"]
+
+_NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+class StringPool:
+    """Interns repeated strings (phrases, wind, UV labels) to small integer codes shared by all batches."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def intern(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=self.values)
+
+CONTENT_POOL = StringPool()
+WIND_POOL = StringPool()
+UV_POOL = StringPool()
+
+def _parse_number(text):
+    match = _NUMBER_RE.search(text or "")
+    return float(match.group(0).replace(",", ".")) if match else np.nan
+
+def _format_numbers(values, pattern):
+    """Formats a float array back to the scraped text (e.g. 32.0 -> "32°"), once per distinct value."""
+    uniques, inverse = np.unique(values, return_inverse=True)
+    labels = np.array(["" if np.isnan(u) else pattern.format(u) for u in uniques], dtype=object)
+    return labels[inverse.reshape(-1)]
+
+class ForecastBatch:
+    """
+    Struct-of-arrays hourly forecast rows. Branches and forecast days are integer keys
+    (branch_id is the row position in the branches DataFrame, day is a DAY_LABELS code),
+    phrases/wind/UV are codes into the shared string pools and measurements are numeric arrays.
+    Branch metadata is only attached by to_frame(), i.e. by the sinks.
+    """
+
+    FIELDS = {
+        "branch_id": np.int32, "day": np.int8, "hour": np.int8,
+        "temperature": np.float32, "humidity": np.float32,
+        "content": np.int32, "wind": np.int32, "uv_index": np.int32,
+    }
+    __slots__ = tuple(FIELDS)
+
+    def __init__(self, **arrays):
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.asarray(arrays.get(name, ()), dtype=dtype))
+
+    def __len__(self):
+        return len(self.branch_id)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.FIELDS)
+
+    @classmethod
+    def from_hourly_rows(cls, branch_id, day, hourly_rows):
+        """Builds a batch from parsed/stored hourly dicts (hour, temperature, content, wind, humidity, uv_index)."""
+        n = len(hourly_rows)
+        hours = [_parse_number(r["hour"]) for r in hourly_rows]
+        return cls(
+            branch_id=np.full(n, branch_id), day=np.full(n, day),
+            hour=[-1 if np.isnan(h) else int(h) for h in hours],
+            temperature=[_parse_number(r["temperature"]) for r in hourly_rows],
+            humidity=[_parse_number(r["humidity"]) for r in hourly_rows],
+            content=[CONTENT_POOL.intern(r["content"]) for r in hourly_rows],
+            wind=[WIND_POOL.intern(r["wind"]) for r in hourly_rows],
+            uv_index=[UV_POOL.intern(r["uv_index"]) for r in hourly_rows],
+        )
+
+    @classmethod
+    def concat(cls, batches):
+        batches = list(batches)
+        if not batches:
+            return cls()
+        return cls(**{name: np.concatenate([getattr(b, name) for b in batches]) for name in cls.FIELDS})
+
+    def select_days(self, days):
+        """The rows whose day code is in `days`."""
+        mask = np.isin(self.day, list(days))
+        return ForecastBatch(**{name: getattr(self, name)[mask] for name in self.FIELDS})
+
+    def conditions(self):
+        """
+        (condition codes into CONDITIONS, rain intensity levels) per row, looked up through the
+        content codes: each pooled phrase is classified once, however many batches use it.
+        """
+        conditions, levels = lookup_tables(CONTENT_POOL.values, classify_phrase)
+        return conditions[self.content], levels[self.content]
+
+    def to_frame(self, branches_df):
+        """
+        Materializes the original weather DataFrame layout (text columns as scraped), joining
+        branch metadata from `branches_df` by position, plus each phrase's condition and rain intensity.
+        """
+        if not len(self):
+            return pd.DataFrame(columns=FRAME_COLUMNS)
+        meta = branches_df[BRANCH_COLUMNS].iloc[self.branch_id].reset_index(drop=True)
+        day_labels = np.array([DAY_LABELS.get(d, str(d)) for d in range(max(DAY_LABELS) + 1)], dtype=object)
+        hour = self.hour.astype(np.float32)
+        hour[self.hour < 0] = np.nan
+        conditions, rain_intensity = self.conditions()
+        return meta.assign(
+            forecast_day=day_labels[self.day],
+            hour=_format_numbers(hour, "{:02.0f}"),
+            temperature=_format_numbers(self.temperature, "{:g}°"),
+            content=np.asarray(CONTENT_POOL.values, dtype=object)[self.content],
+            wind=np.asarray(WIND_POOL.values, dtype=object)[self.wind],
+            humidity=_format_numbers(self.humidity, "{:g}%"),
+            uv_index=np.asarray(UV_POOL.values, dtype=object)[self.uv_index],
+            condition=pd.Categorical.from_codes(conditions, categories=CONDITIONS),
+            rain_intensity=rain_intensity,
+        )[FRAME_COLUMNS]
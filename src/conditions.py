@@ -0,0 +1,115 @@
+# conditions.py
+import functools
+
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+CONDITIONS = ["unknown", "clear", "cloudy", "fog", "drizzle", "rain", "showers", "thunderstorm", "snow"]
+RAIN_INTENSITIES = ["none", "light", "moderate", "heavy"]    # the level is the index: 0 = no rain
+RAIN_INTENSITY_LABELS_VI = ["Không mưa", "Mưa nhỏ", "Mưa vừa", "Mưa to"]
+
+# Open-Meteo / WMO weather codes -> (condition, rain intensity level)
+WMO_CATEGORIES = {
+    0: ("clear", 0), 1: ("clear", 0), 2: ("cloudy", 0), 3: ("cloudy", 0), 45: ("fog", 0), 48: ("fog", 0),
+    51: ("drizzle", 1), 53: ("drizzle", 1), 55: ("drizzle", 1), 56: ("drizzle", 1), 57: ("drizzle", 1),
+    61: ("rain", 1), 63: ("rain", 2), 65: ("rain", 3), 66: ("rain", 2), 67: ("rain", 3),
+    71: ("snow", 0), 73: ("snow", 0), 75: ("snow", 0), 77: ("snow", 0), 85: ("snow", 0), 86: ("snow", 0),
+    80: ("showers", 1), 81: ("showers", 2), 82: ("showers", 3),
+    95: ("thunderstorm", 2), 96: ("thunderstorm", 2), 99: ("thunderstorm", 3),
+}
+
+# AccuWeather phrases (lowercased) -> (condition, rain intensity level); the first rule with a keyword
+# in the phrase wins, so specific phrases come before general ones. Any phrase with "mưa", "dông"
+# or "giông" ends up with a rain level of at least 1; rain checks everywhere are rain_intensity > 0.
+PHRASE_RULES = [
+    (("dông mạnh", "giông mạnh", "bão"), "thunderstorm", 3),
+    (("dông", "giông"), "thunderstorm", 2),
+    (("mưa phùn",), "drizzle", 1),
+    (("mưa rào lớn", "mưa rào to", "mưa rào mạnh"), "showers", 3),
+    (("mưa rào nhẹ", "mưa rào rải rác", "vài cơn mưa rào"), "showers", 1),
+    (("mưa rào",), "showers", 2),
+    (("mưa to", "mưa lớn", "mưa rất to"), "rain", 3),
+    (("mưa nhỏ", "mưa nhẹ", "mưa rải rác", "vài cơn mưa"), "rain", 1),
+    (("mưa",), "rain", 2),
+    (("tuyết",), "snow", 0),
+    (("sương mù",), "fog", 0),
+    (("nắng", "quang", "trời trong", "ít mây"), "clear", 0),
+    (("mây", "u ám"), "cloudy", 0),
+]
+UNKNOWN = ("unknown", 0)
+
+# --- CLASSIFIERS (memoized per distinct value) ---
+
+@functools.lru_cache(maxsize=None)
+def classify_phrase(phrase):
+    """(condition, rain intensity level) of a forecast phrase such as "Mưa rào" or "Có mây"."""
+    if not isinstance(phrase, str):
+        return UNKNOWN
+    text = phrase.strip().lower()
+    for keywords, condition, level in PHRASE_RULES:
+        if any(keyword in text for keyword in keywords):
+            return condition, level
+    return UNKNOWN
+
+@functools.lru_cache(maxsize=None)
+def classify_wmo(code):
+    """(condition, rain intensity level) of a WMO weather code."""
+    if pd.isna(code):
+        return UNKNOWN
+    return WMO_CATEGORIES.get(int(code), UNKNOWN)
+
+# --- VECTORIZED LOOKUP ---
+
+def lookup_tables(values, classify):
+    """
+    Condition and intensity lookup arrays for a list of distinct values, indexed by category code,
+    with a trailing "unknown"/0 entry so code -1 (missing) maps to it.
+    """
+    pairs = [classify(value) for value in values] + [UNKNOWN]
+    condition_codes = {name: i for i, name in enumerate(CONDITIONS)}
+    return (np.array([condition_codes[c] for c, _ in pairs], dtype=np.int8),
+            np.array([level for _, level in pairs], dtype=np.int8))
+
+def _from_codes(codes, categories, classify):
+    conditions, levels = lookup_tables(list(categories), classify)
+    return pd.DataFrame({
+        "condition": pd.Categorical.from_codes(conditions[codes], categories=CONDITIONS),
+        "rain_intensity": levels[codes],
+    })
+
+def classify_content(content):
+    """
+    Per-row condition (categorical) and rain_intensity (0-3) of a phrase column. Each distinct
+    phrase is classified once; rows are resolved through their category codes.
+    """
+    content = pd.Series(content).astype("category")
+    return _from_codes(content.cat.codes.to_numpy(), content.cat.categories, classify_phrase)
+
+def classify_weathercodes(codes):
+    """Per-row condition and rain_intensity of a WMO weathercode column."""
+    codes, uniques = pd.factorize(pd.Series(codes), use_na_sentinel=True)
+    return _from_codes(codes, uniques, classify_wmo)
+
+def with_conditions(weather_df):
+    """
+    The hourly frame with condition and rain_intensity columns. Frames from ForecastBatch.to_frame()
+    already carry them; others (e.g. read back from the DB) are classified from their content.
+    """
+    if "condition" in weather_df and "rain_intensity" in weather_df:
+        return weather_df
+    categories = classify_content(weather_df["content"])
+    return weather_df.assign(condition=categories["condition"].array,
+                             rain_intensity=categories["rain_intensity"].to_numpy())
+
+# --- LABELS ---
+
+def rain_text(peak, thunder=False):
+    """Vietnamese label of a peak intensity level, e.g. "Mưa vừa" or "Mưa to có dông"."""
+    return RAIN_INTENSITY_LABELS_VI[int(peak)] + (" có dông" if thunder else "")
+
+def rain_label(rows):
+    """rain_text() of the rainy rows of a frame with condition/rain_intensity columns."""
+    levels = rows["rain_intensity"].to_numpy()
+    thunder = (rows["condition"] == "thunderstorm").to_numpy()
+    return rain_text(levels.max(initial=0), (thunder & (levels > 0)).any())
@@ -0,0 +1,147 @@
+# delta.py
+import hashlib
+import json
+from datetime import timedelta
+
+from src.batch import ForecastBatch
+from src.scraper import DAY_LABELS, PARSE_ERRORS
+from src.utils import SUMMARY_COLUMNS, WEATHER_COLUMNS, ingestion_rows, insert_rows
+
+# The per-hour fields that make up a forecast's content (branch metadata is excluded)
+HOURLY_FIELDS = ["hour", "temperature", "content", "wind", "humidity", "uv_index"]
+SUMMARY_FIELDS = ["branch", "address", "latitude", "longitude", "district", "forecast_day", "summary_text"]
+
+def page_hash(text):
+    """Hash of a raw forecast page / API response."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def content_hash(hourly_rows):
+    """Hash of the parsed hourly rows, independent of which branch they were scraped for."""
+    payload = json.dumps([[row[f] for f in HOURLY_FIELDS] for row in hourly_rows], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def format_scraped_at(ts):
+    """scraped_at as stored in every table, so version references can be matched exactly."""
+    return ts.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def load_latest_versions(conn, branch):
+    """The most recent version row per forecast day for a branch."""
+    cursor = conn.execute('''
+        SELECT forecast_day, forecast_date, page_hash, content_hash, data_scraped_at FROM forecast_versions
+        WHERE id IN (SELECT MAX(id) FROM forecast_versions WHERE branch = ? GROUP BY forecast_day)
+    ''', (branch,))
+    return {row[0]: {"forecast_date": row[1], "page_hash": row[2], "content_hash": row[3], "data_scraped_at": row[4]}
+            for row in cursor.fetchall()}
+
+def load_version_rows(conn, branch, forecast_day, data_scraped_at):
+    cursor = conn.execute(f'''
+        SELECT {", ".join(HOURLY_FIELDS)} FROM weather_data
+        WHERE branch = ? AND forecast_day = ? AND scraped_at = ? ORDER BY id
+    ''', (branch, forecast_day, data_scraped_at))
+    return [dict(zip(HOURLY_FIELDS, row)) for row in cursor.fetchall()]
+
+def version_rows_exist(conn, branch, forecast_day, data_scraped_at):
+    cursor = conn.execute('''
+        SELECT 1 FROM weather_data WHERE branch = ? AND forecast_day = ? AND scraped_at = ? LIMIT 1
+    ''', (branch, forecast_day, data_scraped_at))
+    return cursor.fetchone() is not None
+
+def load_version_summaries(conn, branch, data_scraped_at_by_day):
+    summaries = []
+    for forecast_day, data_scraped_at in data_scraped_at_by_day.items():
+        cursor = conn.execute(f'''
+            SELECT {", ".join(SUMMARY_FIELDS)} FROM daily_summaries
+            WHERE branch = ? AND forecast_day = ? AND scraped_at = ?
+        ''', (branch, forecast_day, data_scraped_at))
+        summaries.extend(dict(zip(SUMMARY_FIELDS, row)) for row in cursor.fetchall())
+    return summaries
+
+def version_branch_forecast(conn, branch_row, day_sources, scraped_at):
+    """
+    Compares each forecast day from a provider with the branch's latest stored version.
+    `day_sources` maps a day code to (source_hash, parse): the hash of the raw page/response and a
+    callable returning its hourly rows. Unchanged sources are not parsed; their rows are read back
+    from the DB. Returns (batch, versions): a ForecastBatch keyed by branch_row.name (the row's
+    position in the branches DataFrame) and one version dict per day with a `changed` flag.
+    """
+    previous = load_latest_versions(conn, branch_row["branch"])
+    batches, versions = [], []
+    for day, (p_hash, parse) in sorted(day_sources.items()):
+        day_label = DAY_LABELS.get(day, str(day))
+        forecast_date = (scraped_at.date() + timedelta(days=day - 1)).isoformat()
+        prev = previous.get(day_label)
+        if prev and prev["forecast_date"] != forecast_date:
+            prev = None
+        try:
+            hourly_rows = None
+            if prev and prev["page_hash"] == p_hash:
+                hourly_rows = load_version_rows(conn, branch_row["branch"], day_label, prev["data_scraped_at"])
+            if hourly_rows:
+                c_hash = prev["content_hash"]
+            else:
+                hourly_rows = parse()
+                c_hash = content_hash(hourly_rows)
+                # Only reference the previous version if its rows are still stored
+                if prev and prev["content_hash"] == c_hash and not version_rows_exist(
+                        conn, branch_row["branch"], day_label, prev["data_scraped_at"]):
+                    prev = None
+        except PARSE_ERRORS as e:
+            print(f"    [ERROR] Could not parse {branch_row['branch']} ({branch_row['district']}) for day {day}. Reason: {e}")
+            continue
+        if not hourly_rows:
+            continue
+
+        changed = not (prev and prev["content_hash"] == c_hash)
+        batches.append(ForecastBatch.from_hourly_rows(branch_row.name, day, hourly_rows))
+        versions.append({
+            "branch": branch_row["branch"], "district": branch_row["district"],
+            "forecast_day": day_label, "forecast_date": forecast_date,
+            "page_hash": p_hash, "content_hash": c_hash,
+            "data_scraped_at": format_scraped_at(scraped_at) if changed else prev["data_scraped_at"],
+            "changed": changed,
+        })
+    return ForecastBatch.concat(batches), versions
+
+def changed_days(versions):
+    return {v["forecast_day"] for v in versions if v["changed"]}
+
+def day_codes(day_labels):
+    """DAY_LABELS codes of a set of forecast_day labels (for ForecastBatch.select_days)."""
+    return {code for code, label in DAY_LABELS.items() if label in day_labels}
+
+def change_rows(weather_df, summaries_list, versions, scraped_at):
+    """
+    The rows ingest_changes() writes: weather and summary rows of only the forecast days whose
+    content changed, plus a version row for every day. Built by the producer before the job is queued.
+    """
+    days = changed_days(versions)
+    stamp = format_scraped_at(scraped_at)
+    weather_rows, summary_rows = ingestion_rows(weather_df[weather_df["forecast_day"].isin(days)],
+                                                [s for s in summaries_list if s["forecast_day"] in days], stamp)
+    version_rows = [(stamp, v["branch"], v["district"], v["forecast_day"], v["forecast_date"],
+                     v["page_hash"], v["content_hash"], v["data_scraped_at"]) for v in versions]
+    return weather_rows, summary_rows, version_rows
+
+def ingest_changes(conn, weather_rows, summary_rows, version_rows):
+    """Inserts the rows built by change_rows() (no commit; runs as a SQLiteWriter job)."""
+    insert_rows(conn, "weather_data", WEATHER_COLUMNS, weather_rows)
+    insert_rows(conn, "daily_summaries", SUMMARY_COLUMNS, summary_rows)
+    conn.executemany('''
+        INSERT INTO forecast_versions (scraped_at, branch, district, forecast_day, forecast_date,
+                                       page_hash, content_hash, data_scraped_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', version_rows)
+
+def summaries_for_versions(conn, batch, branches_df, versions, generate_summaries):
+    """
+    Rain summaries for a branch: regenerated for changed days, read back from the referenced
+    version for unchanged ones (falling back to regeneration if that version has none).
+    Only the days that are regenerated are materialized from the batch.
+    """
+    days = changed_days(versions)
+    unchanged = {v["forecast_day"]: v["data_scraped_at"] for v in versions if not v["changed"]}
+    summaries = load_version_summaries(conn, versions[0]["branch"], unchanged) if unchanged else []
+    days |= set(unchanged) - {s["forecast_day"] for s in summaries}
+    if days:
+        summaries.extend(generate_summaries(batch.select_days(day_codes(days)).to_frame(branches_df)))
+    return summaries
@@ -0,0 +1,142 @@
+# events.py
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from src.utils import DB_FILE
+from src.weather_scraper import BRANCH_CSV_PATH, HISTORICAL_REPORTS_FOLDER, sanitize_filename, find_latest_file
+
+# --- CONFIGURATION ---
+RAIN_THRESHOLD_MM = 0.1          # an hour counts as rainy above this (same as analyze_precipitation_summary)
+ROLLING_HOURS = 3
+EXTREME_PERCENTILE = 95          # per-branch percentile of wet rolling-window totals
+STORM_MIN_HOURS = 3              # consecutive rainy hours that make a storm spell
+EVENING_PEAK_HOURS = range(17, 22)
+
+EVENT_COLUMNS = ["branch", "event_type", "start", "end", "hours", "total_mm", "peak_mm", "threshold_mm"]
+
+# --- LOADING ---
+
+def load_hourly_precipitation(db_file=DB_FILE, branches_csv=BRANCH_CSV_PATH):
+    """
+    (branch, datetime, precipitation) rows for all branches: the backfilled historical_hourly table
+    when it has data, otherwise each branch's latest historical CSV report.
+    """
+    if os.path.exists(db_file):
+        with sqlite3.connect(db_file) as conn:
+            has_table = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historical_hourly'").fetchone()
+            if has_table:
+                df = pd.read_sql_query("SELECT branch, datetime, precipitation FROM historical_hourly", conn)
+                if not df.empty:
+                    df["datetime"] = pd.to_datetime(df["datetime"])
+                    return df
+
+    frames = []
+    for branch in pd.read_csv(branches_csv)["branch"]:
+        path = find_latest_file(os.path.join(HISTORICAL_REPORTS_FOLDER, f"{sanitize_filename(branch)}_historical_*.csv"))
+        if path:
+            frames.append(pd.read_csv(path, usecols=["datetime", "precipitation"], parse_dates=["datetime"]).assign(branch=branch))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["branch", "datetime", "precipitation"])
+
+def to_matrix(df):
+    """Pivots long rows into a (branches x hours) float32 matrix on one shared hourly time axis."""
+    branch_codes, branches = pd.factorize(df["branch"])
+    times = df["datetime"].dt.floor("h")
+    t0 = times.min()
+    cols = ((times - t0) // pd.Timedelta(hours=1)).to_numpy()
+    matrix = np.full((len(branches), cols.max() + 1), np.nan, dtype=np.float32)
+    matrix[branch_codes, cols] = df["precipitation"].to_numpy(dtype=np.float32)
+    return matrix, np.asarray(branches, dtype=object), pd.date_range(t0, periods=matrix.shape[1], freq="h")
+
+# --- RUN DETECTION (vectorized over all branches at once) ---
+
+def _runs(mask):
+    """(row, first_col, last_col) of every run of True values in each row of a 2D mask."""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)   # row-major order keeps starts and ends paired
+    return rows, starts, ends - 1
+
+def _span_stats(values, rows, first, last):
+    """Sum and max of values[row, first:last + 1] for many spans, without a Python loop."""
+    width = values.shape[1]
+    flat = np.append(values.ravel(), 0.0)
+    start, stop = rows * width + first, rows * width + last + 1
+    cumsum = np.concatenate([[0.0], np.cumsum(flat, dtype=np.float64)])
+    totals = cumsum[stop] - cumsum[start]
+    if not len(start):
+        return totals, totals
+    peaks = np.maximum.reduceat(flat, np.column_stack([start, stop]).ravel())[::2]
+    return totals, peaks
+
+def _events(event_type, branches, times, values, rows, first, last, thresholds=None):
+    totals, peaks = _span_stats(values, rows, first, last)
+    events = pd.DataFrame({
+        "branch": branches[rows], "event_type": event_type,
+        "start": times[first], "end": times[last] + pd.Timedelta(hours=1),
+        "hours": last - first + 1, "total_mm": totals.round(2), "peak_mm": peaks.round(2),
+    })
+    if thresholds is not None:
+        events["threshold_mm"] = thresholds[rows].round(2)
+    return events
+
+def detect_rain_events(df):
+    """
+    Flags, for every branch at once:
+    - extreme: rolling 3-hour totals above the branch's 95th percentile of wet 3-hour windows
+    - storm_spell: at least STORM_MIN_HOURS consecutive rainy hours
+    - evening_start: a rain spell that starts during EVENING_PEAK_HOURS
+    Returns an events table with start, end (exclusive), total and peak per branch.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    matrix, branches, times = to_matrix(df)
+    precip = np.nan_to_num(matrix, nan=0.0)
+
+    # Rolling window totals from one cumulative sum; window j covers hours j .. j + ROLLING_HOURS - 1
+    cumsum = np.concatenate([np.zeros((len(precip), 1)), np.cumsum(precip, axis=1, dtype=np.float64)], axis=1)
+    rolling = cumsum[:, ROLLING_HOURS:] - cumsum[:, :-ROLLING_HOURS]
+    wet = np.where(rolling > RAIN_THRESHOLD_MM, rolling, np.nan)
+    has_wet = ~np.isnan(wet).all(axis=1)
+    thresholds = np.full(len(precip), np.inf)
+    thresholds[has_wet] = np.nanpercentile(wet[has_wet], EXTREME_PERCENTILE, axis=1)
+    rows, first, last = _runs(rolling > thresholds[:, None])
+    extreme = _events("extreme", branches, times, precip, rows, first, last + ROLLING_HOURS - 1, thresholds)
+
+    rainy = precip > RAIN_THRESHOLD_MM
+    rows, first, last = _runs(rainy)
+    long_spell = (last - first + 1) >= STORM_MIN_HOURS
+    storms = _events("storm_spell", branches, times, precip, rows[long_spell], first[long_spell], last[long_spell])
+    evening = np.isin(times.hour.to_numpy()[first], list(EVENING_PEAK_HOURS))
+    evenings = _events("evening_start", branches, times, precip, rows[evening], first[evening], last[evening])
+
+    found = [e for e in (extreme, storms, evenings) if not e.empty]
+    if not found:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    events = pd.concat(found, ignore_index=True).reindex(columns=EVENT_COLUMNS)
+    return events.sort_values(["branch", "start", "event_type"], ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect extreme-rain events across all branches' hourly history.")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file (events go to the rain_events table)")
+    parser.add_argument("--csv", help="also write the events table to this CSV file")
+    args = parser.parse_args()
+
+    df = load_hourly_precipitation(args.db)
+    print(f"Loaded {len(df)} hourly rows for {df['branch'].nunique()} branches.")
+    events = detect_rain_events(df)
+    with sqlite3.connect(args.db) as conn:
+        events.assign(start=events["start"].astype(str), end=events["end"].astype(str)).to_sql(
+            "rain_events", conn, if_exists="replace", index=False)
+    if args.csv:
+        events.to_csv(args.csv, index=False, encoding="utf-8-sig")
+    print(events.groupby("event_type").size().to_string() if not events.empty else "No rain events detected.")
+
+if __name__ == "__main__":
+    main()
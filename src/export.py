@@ -0,0 +1,151 @@
+# export.py
+import glob
+import os
+from datetime import date, datetime
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is in requirements.txt; without it only CSV can be exported
+    pa = None
+
+from src.utils import CSV_OUTPUT_FOLDER, save_to_csv, summaries_frame
+
+# --- CONFIGURATION ---
+# "csv" (Excel-friendly), "parquet", "arrow" (Arrow IPC / Feather v2); several joined by ","
+EXPORT_FORMATS = ["csv"]
+COLUMNAR_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+COMPRESSION = "zstd"
+
+# Layout: weather_reports/<dataset>/scrape_date=YYYY-MM-DD/<dataset>_<timestamp>.<ext>
+PARTITION_KEY = "scrape_date"
+
+# Repeated strings are stored once per file as dictionary (categorical) columns
+CATEGORY_COLUMNS = ["branch", "address", "district", "forecast_day", "content", "wind", "uv_index"]
+NUMBER_PATTERN = r"(-?\d+(?:[.,]\d+)?)"
+
+def parse_export_formats(value):
+    formats = [f.strip().lower() for f in value.split(",") if f.strip()]
+    unknown = [f for f in formats if f != "csv" and f not in COLUMNAR_EXTENSIONS]
+    if not formats or unknown:
+        raise ValueError(f"Unknown export format '{value}'. Choose from: csv, {', '.join(COLUMNAR_EXTENSIONS)}.")
+    _require_pyarrow(formats)
+    return formats
+
+def _require_pyarrow(formats):
+    """Columnar formats need pyarrow; fail before scraping rather than quietly exporting something else."""
+    columnar = [f for f in formats if f != "csv"]
+    if columnar and pa is None:
+        raise ImportError(f"Exporting {', '.join(columnar)} requires pyarrow (pip install -r requirements.txt).")
+
+# --- TYPED FRAMES ---
+
+def _numbers(text, dtype):
+    return pd.to_numeric(text.astype(str).str.extract(NUMBER_PATTERN, expand=False).str.replace(",", "."),
+                         errors="coerce").astype(dtype)
+
+def typed_hourly_frame(weather_df, scraped_at):
+    """The hourly rows with numeric hour/temperature/humidity and categorical text columns."""
+    df = weather_df.copy()
+    df["hour"] = _numbers(df["hour"], "Int8")
+    df["temperature"] = _numbers(df["temperature"], "float32")
+    df["humidity"] = _numbers(df["humidity"], "float32")
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+    df.insert(0, "scraped_at", pd.Timestamp(scraped_at))
+    return df.reset_index(drop=True)
+
+def typed_summaries_frame(summaries_list, scraped_at):
+    df = summaries_frame(summaries_list)
+    for column in ["branch", "address", "district", "forecast_day"]:
+        df[column] = df[column].astype("category")
+    df.insert(0, "scraped_at", pd.Timestamp(scraped_at))
+    return df.reset_index(drop=True)
+
+# --- WRITING ---
+
+def _write_table(df, path, fmt):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if fmt == "parquet":
+        pq.write_table(table, path, compression=COMPRESSION)
+    else:
+        feather.write_feather(table, path, compression=COMPRESSION)
+
+def save_columnar(weather_df, summaries_list, fmt, scraped_at, folder=CSV_OUTPUT_FOLDER):
+    """Writes one run as Parquet or Arrow IPC files, partitioned by scrape date."""
+    timestamp_str = scraped_at.strftime("%Y-%m-%d_%H-%M-%S")
+    frames = {
+        "hourly_weather": typed_hourly_frame(weather_df, scraped_at) if not weather_df.empty else None,
+        "rain_summaries": typed_summaries_frame(summaries_list, scraped_at) if summaries_list else None,
+    }
+    for dataset, df in frames.items():
+        if df is None:
+            continue
+        partition = os.path.join(folder, dataset, f"{PARTITION_KEY}={scraped_at.strftime('%Y-%m-%d')}")
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, f"{dataset}_{timestamp_str}.{COLUMNAR_EXTENSIONS[fmt]}")
+        _write_table(df, path, fmt)
+        print(f"  - Saved {dataset} ({fmt}) to {path}")
+
+def export_run(weather_df, summaries_list, scraped_at=None, formats=EXPORT_FORMATS):
+    """Saves a run's outputs in each requested format (Parquet/Arrow require pyarrow)."""
+    scraped_at = scraped_at or datetime.now()
+    _require_pyarrow(formats)
+    columnar = [f for f in formats if f != "csv"]
+    if "csv" in formats:
+        save_to_csv(weather_df, summaries_list, scraped_at)
+    for fmt in columnar:
+        save_columnar(weather_df, summaries_list, fmt, scraped_at)
+
+# --- READING ---
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+def run_files(dataset="hourly_weather", start=None, end=None, folder=CSV_OUTPUT_FOLDER):
+    """
+    Columnar files of the runs scraped between `start` and `end` (inclusive dates), oldest first.
+    Only partition directory names are inspected; no file outside the range is opened. A run exported
+    in both formats is listed once (Parquet preferred).
+    """
+    start, end = _as_date(start), _as_date(end)
+    runs = {}
+    for partition in sorted(glob.glob(os.path.join(folder, dataset, f"{PARTITION_KEY}=*"))):
+        try:
+            scrape_date = date.fromisoformat(os.path.basename(partition).split("=", 1)[1])
+        except ValueError:
+            continue
+        if (start and scrape_date < start) or (end and scrape_date > end):
+            continue
+        for ext in COLUMNAR_EXTENSIONS.values():
+            for path in glob.glob(os.path.join(partition, f"*.{ext}")):
+                runs.setdefault(os.path.splitext(os.path.basename(path))[0], path)
+    return [runs[run] for run in sorted(runs)]
+
+def _read_table(path, columns=None):
+    if path.endswith(".parquet"):
+        return pq.read_table(path, columns=columns)
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+def iter_runs(dataset="hourly_weather", start=None, end=None, columns=None, folder=CSV_OUTPUT_FOLDER):
+    """Yields one DataFrame per exported run in the date range; each file is only read when reached."""
+    if pa is None:
+        raise ImportError("Reading Parquet/Arrow exports requires pyarrow (pip install pyarrow).")
+    for path in run_files(dataset, start, end, folder):
+        yield _read_table(path, columns).to_pandas()
+
+def load_runs(dataset="hourly_weather", start=None, end=None, columns=None, folder=CSV_OUTPUT_FOLDER):
+    """All runs in the date range as one DataFrame, reading only the requested columns."""
+    if pa is None:
+        raise ImportError("Reading Parquet/Arrow exports requires pyarrow (pip install pyarrow).")
+    tables = [_read_table(path, columns) for path in run_files(dataset, start, end, folder)]
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    # Dictionary columns are unified across runs, so they stay categorical in pandas
+    return pa.concat_tables(tables, promote_options="default").unify_dictionaries().to_pandas()
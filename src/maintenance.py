@@ -0,0 +1,164 @@
+# maintenance.py
+import argparse
+import gzip
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.conditions import classify_content
+from src.utils import DB_FILE, DAY_LABELS
+
+# --- CONFIGURATION ---
+RETENTION_DAYS = 30          # full-resolution scrapes younger than this stay in weather_data
+ARCHIVE_FOLDER = "archive"
+# Unchanged forecasts reference rows of earlier scrapes of the same forecast date (see delta.py),
+# which can be up to 2 days older; never age out rows that could still be referenced.
+MIN_RETENTION_DAYS = 3
+# Backfilled history and the events derived from it are kept much longer than scrapes, and longer
+# than the backfill window (backfill.BACKFILL_DAYS), so backfills never re-fetch pruned history
+HISTORY_RETENTION_DAYS = 800
+
+# Every table that grows with each run: the column its age is read from and how many days it is
+# kept (None: the run's keep_days). Aged rows are archived, then deleted.
+RETENTION = {
+    "weather_data": ("scraped_at", None),
+    "daily_summaries": ("scraped_at", None),
+    "forecast_versions": ("scraped_at", None),
+    "branch_notifications": ("scraped_at", None),
+    "alerts": ("evaluated_at", None),
+    "alert_inputs": ("evaluated_at", None),
+    "nowcast_15min": ("interval_start", None),
+    "historical_hourly": ("datetime", HISTORY_RETENTION_DAYS),
+    "backfill_chunks": ("chunk_end", HISTORY_RETENTION_DAYS),
+    "rain_events": ("start", HISTORY_RETENTION_DAYS),
+}
+
+DAY_CODES = {label: code for code, label in DAY_LABELS.items()}
+SNAPSHOT_KEY = ["branch", "forecast_date", "accuweather_day_param"]
+
+# --- HELPERS ---
+
+def _cutoff_str(keep_days, now=None):
+    cutoff = (now or datetime.now()) - timedelta(days=keep_days)
+    return cutoff.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def archive_rows(df, table, archive_folder=ARCHIVE_FOLDER, column="scraped_at"):
+    """Appends aged rows to one gzip'd CSV per table and month of `column`, e.g. weather_data_2025-08.csv.gz"""
+    if df.empty:
+        return []
+    os.makedirs(archive_folder, exist_ok=True)
+    paths = []
+    for month, month_df in df.groupby(df[column].astype(str).str[:7]):
+        path = os.path.join(archive_folder, f"{table}_{month}.csv.gz")
+        write_header = not os.path.exists(path)
+        # Appending produces a multi-member gzip file, which gzip/pandas read back as one stream
+        with gzip.open(path, "at", encoding="utf-8", newline="") as f:
+            month_df.to_csv(f, index=False, header=write_header)
+        paths.append(path)
+    return paths
+
+def rollup_daily_forecasts(weather_df):
+    """
+    Rolls hourly rows into one snapshot per (branch, forecast date, day offset), taken from the
+    last scrape of that forecast: high/low temperature, the most frequent phrase and a rain flag.
+    """
+    if weather_df.empty:
+        return pd.DataFrame()
+    df = weather_df.copy()
+    df["accuweather_day_param"] = df["forecast_day"].map(DAY_CODES)
+    df = df.dropna(subset=["accuweather_day_param"])
+    df["accuweather_day_param"] = df["accuweather_day_param"].astype(int)
+    scrape_day = pd.to_datetime(df["scraped_at"], format="mixed").dt.normalize()
+    df["forecast_date"] = (scrape_day + pd.to_timedelta(df["accuweather_day_param"] - 1, unit="D")).dt.strftime("%Y-%m-%d")
+    df["temp_c"] = df["temperature"].str.extract(r"(-?\d+(?:\.\d+)?)", expand=False).astype(float)
+    df["had_rain"] = (classify_content(df["content"])["rain_intensity"].to_numpy() > 0).astype(int)
+
+    df = df[df["scraped_at"] == df.groupby(SNAPSHOT_KEY)["scraped_at"].transform("max")]
+    phrases = (df.groupby(SNAPSHOT_KEY + ["content"]).size().rename("n").reset_index()
+                 .sort_values("n", ascending=False).drop_duplicates(SNAPSHOT_KEY)
+                 .set_index(SNAPSHOT_KEY)["content"].rename("phrase"))
+    snapshots = df.groupby(SNAPSHOT_KEY).agg(
+        scraped_at=("scraped_at", "first"), address=("address", "first"),
+        latitude=("latitude", "first"), longitude=("longitude", "first"), district=("district", "first"),
+        high_c=("temp_c", "max"), low_c=("temp_c", "min"), had_rain=("had_rain", "max"),
+    ).join(phrases).reset_index()
+    return snapshots[["scraped_at", "branch", "address", "latitude", "longitude", "district", "forecast_date",
+                      "accuweather_day_param", "high_c", "low_c", "phrase", "had_rain"]]
+
+def store_daily_forecasts(conn, snapshots):
+    """Inserts snapshots, replacing older snapshots of the same key from earlier maintenance runs."""
+    if snapshots.empty:
+        return 0
+    conn.executemany('''
+        DELETE FROM daily_forecasts
+        WHERE branch = ? AND forecast_date = ? AND accuweather_day_param = ? AND scraped_at <= ?
+    ''', snapshots[SNAPSHOT_KEY + ["scraped_at"]].itertuples(index=False, name=None))
+    snapshots.to_sql("daily_forecasts", conn, if_exists="append", index=False)
+    return len(snapshots)
+
+# --- MAIN WORKFLOW ---
+
+def run_maintenance(db_file=DB_FILE, keep_days=RETENTION_DAYS, archive_folder=ARCHIVE_FOLDER, vacuum=True):
+    """
+    Rolls up, archives and deletes scrapes older than `keep_days` (and rows of the other RETENTION
+    tables older than their own retention), then compacts the DB.
+    """
+    if keep_days < MIN_RETENTION_DAYS:
+        raise ValueError(f"keep_days must be at least {MIN_RETENTION_DAYS} (got {keep_days})")
+    print(f"\n--- Running DB maintenance at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---")
+    size_before = os.path.getsize(db_file)
+    cutoff = _cutoff_str(keep_days)
+    print(f"Keeping full-resolution scrapes newer than {cutoff[:19]} ({keep_days} days).")
+
+    with closing(sqlite3.connect(db_file)) as conn, conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily_forecasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, scraped_at TIMESTAMP, branch TEXT, address TEXT,
+                latitude REAL, longitude REAL, district TEXT, forecast_date DATE,
+                accuweather_day_param INTEGER, high_c REAL, low_c REAL, phrase TEXT, had_rain INTEGER
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_daily_forecasts_key ON daily_forecasts (branch, forecast_date, accuweather_day_param)')
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+        aged_weather = pd.read_sql_query("SELECT * FROM weather_data WHERE scraped_at < ?", conn, params=[cutoff])
+        n_snapshots = store_daily_forecasts(conn, rollup_daily_forecasts(aged_weather))
+        print(f"  - Rolled {len(aged_weather)} hourly rows into {n_snapshots} daily_forecasts snapshots")
+
+        for table, (column, days) in RETENTION.items():
+            if table not in existing:
+                continue
+            table_cutoff = cutoff if days is None else _cutoff_str(days)
+            aged = aged_weather if table == "weather_data" else \
+                pd.read_sql_query(f"SELECT * FROM {table} WHERE {column} < ?", conn, params=[table_cutoff])
+            for path in archive_rows(aged, table, archive_folder, column):
+                print(f"  - Archived {table} rows to {path}")
+            conn.execute(f"DELETE FROM {table} WHERE {column} < ?", (table_cutoff,))
+            print(f"  - Removed {len(aged)} aged rows from {table}")
+
+    if vacuum:
+        # VACUUM can't run inside a transaction; use an autocommit connection
+        conn = sqlite3.connect(db_file, isolation_level=None)
+        try:
+            conn.execute("VACUUM")
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        print(f"  - VACUUM + ANALYZE: {size_before / 1024:.0f} KB -> {os.path.getsize(db_file) / 1024:.0f} KB")
+
+    print("--- Maintenance finished. ---")
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll up, archive and compact the weather forecast DB.")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file")
+    parser.add_argument("--keep-days", type=int, default=RETENTION_DAYS, help="days of full-resolution scrapes to keep")
+    parser.add_argument("--archive-dir", default=ARCHIVE_FOLDER, help="folder for the gzip'd CSV archives")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip VACUUM/ANALYZE")
+    args = parser.parse_args()
+    run_maintenance(args.db, args.keep_days, args.archive_dir, vacuum=not args.no_vacuum)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# notifications.py
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.conditions import rain_text, with_conditions
+from src.utils import CSV_OUTPUT_FOLDER, DB_FILE, DAY_LABELS, consecutive_hour_ranges, sql_rows
+from src.writer import SQLiteWriter
+
+# --- CONFIGURATION ---
+NOTIFICATION_SINKS = ("jsonl", "sqlite")
+NOTIFICATION_COLUMNS = ["branch", "district", "forecast_day", "rainy_hours", "rain_intensity", "rain_hours", "message"]
+
+# Templates are bound once; rendering is one call per message with no string building in between
+RAIN_MESSAGE = "📢 {branch} ({district}) {forecast_day}: {rain} {rain_hours}. Lưu ý: chuẩn bị vật dụng OMOTENASHI hỗ trợ khách.".format
+DRY_MESSAGE = "📢 {branch} ({district}) {forecast_day}: Trời không mưa.".format
+
+# --- GENERATION ---
+
+def build_branch_notifications(weather_df):
+    """
+    One message per (branch, forecast day) for every branch at once: a single grouping pass over
+    the hourly rows, vectorized hour-range grouping, then template rendering. Rain is
+    rain_intensity > 0 (src.conditions); each message names the day's strongest rain.
+    """
+    if weather_df.empty:
+        return pd.DataFrame(columns=NOTIFICATION_COLUMNS)
+    weather_df = with_conditions(weather_df)
+    grouped = weather_df.groupby(["branch", "forecast_day"], sort=False)
+    message_ids = grouped.ngroup().to_numpy()
+    messages = grouped["district"].first().reset_index()
+
+    # Hours are parsed once per distinct value ("00".."23"), like the phrases
+    hour_codes, hour_values = pd.factorize(weather_df["hour"].astype(str))
+    parsed = pd.to_numeric(pd.Series(hour_values).str.extract(r"(\d+)", expand=False), errors="coerce").to_numpy()
+    hours = np.append(parsed, np.nan)[hour_codes]
+    levels = weather_df["rain_intensity"].to_numpy()
+    rain = (levels > 0) & ~np.isnan(hours)
+    run_messages, labels = consecutive_hour_ranges(message_ids[rain], hours[rain].astype(np.int64))
+    peak = np.zeros(len(messages), dtype=np.int8)
+    np.maximum.at(peak, message_ids[rain], levels[rain])
+    thunder = np.zeros(len(messages), dtype=bool)
+    thunder[message_ids[rain & (weather_df["condition"] == "thunderstorm").to_numpy()]] = True
+
+    rain_hours = np.full(len(messages), "", dtype=object)
+    if len(run_messages):
+        # Join each message's range labels with one reduceat over ", "-prefixed labels
+        firsts = np.flatnonzero(np.r_[True, run_messages[1:] != run_messages[:-1]])
+        joined = np.add.reduceat(", " + labels, firsts)
+        rain_hours[run_messages[firsts]] = [text[2:] for text in joined]
+    messages["rainy_hours"] = np.bincount(message_ids[rain], minlength=len(messages))
+    messages["rain_intensity"] = peak
+    messages["rain_hours"] = rain_hours
+    messages["district"] = messages["district"].fillna("")
+    messages["message"] = [
+        (RAIN_MESSAGE if hours_text else DRY_MESSAGE)(branch=b, district=d, forecast_day=f, rain_hours=hours_text,
+                                                      rain=rain_text(p, t))
+        for b, d, f, hours_text, p, t in zip(messages["branch"], messages["district"], messages["forecast_day"],
+                                             rain_hours, peak, thunder)
+    ]
+
+    day_order = {label: code for code, label in DAY_LABELS.items()}
+    messages["day_order"] = messages["forecast_day"].map(day_order)
+    messages = messages.sort_values(["day_order", "branch"], kind="stable").drop(columns="day_order")
+    return messages[NOTIFICATION_COLUMNS].reset_index(drop=True)
+
+# --- OUTPUT ---
+
+def setup_notifications_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS branch_notifications (
+            scraped_at TIMESTAMP NOT NULL, branch TEXT NOT NULL, district TEXT, forecast_day TEXT NOT NULL,
+            rainy_hours INTEGER, rain_intensity INTEGER, rain_hours TEXT, message TEXT,
+            PRIMARY KEY (scraped_at, branch, forecast_day)
+        ) WITHOUT ROWID
+    ''')
+    # Tables created before rain intensities existed get the column added
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(branch_notifications)")}
+    if "rain_intensity" not in columns:
+        conn.execute("ALTER TABLE branch_notifications ADD COLUMN rain_intensity INTEGER")
+
+def notification_rows(notifications_df, scraped_at):
+    """(scraped_at, NOTIFICATION_COLUMNS...) parameter rows, built before the write is queued."""
+    return sql_rows(notifications_df.assign(scraped_at=scraped_at.strftime("%Y-%m-%d %H:%M:%S.%f")),
+                    ["scraped_at"] + NOTIFICATION_COLUMNS)
+
+def store_branch_notifications(conn, rows):
+    """Inserts all messages of a run with one executemany (no commit; usable as a SQLiteWriter job)."""
+    setup_notifications_table(conn)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO branch_notifications (scraped_at, {', '.join(NOTIFICATION_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * (len(NOTIFICATION_COLUMNS) + 1))})", rows)
+
+def save_branch_notifications(notifications_df, scraped_at=None, sink="jsonl", db_file=DB_FILE, writer=None):
+    """
+    Writes a run's messages as one JSONL file in the reports folder, or into the branch_notifications
+    table through `writer` (a SQLiteWriter; one is opened for this call when not given).
+    """
+    if notifications_df.empty:
+        return
+    scraped_at = scraped_at or datetime.now()
+    if sink == "sqlite":
+        if writer is None:
+            with SQLiteWriter(db_file) as own_writer:
+                return save_branch_notifications(notifications_df, scraped_at, sink, db_file, own_writer)
+        writer.submit(store_branch_notifications, notification_rows(notifications_df, scraped_at))
+        print(f"  - Queued {len(notifications_df)} branch notifications for {writer.db_file} (branch_notifications)")
+        return
+    if sink != "jsonl":
+        raise ValueError(f"Unknown notification sink '{sink}'. Choose from: {', '.join(NOTIFICATION_SINKS)}.")
+    filename = os.path.join(CSV_OUTPUT_FOLDER, f"branch_notifications_{scraped_at.strftime('%Y-%m-%d_%H-%M-%S')}.jsonl")
+    notifications_df.assign(scraped_at=scraped_at.strftime("%Y-%m-%d %H:%M:%S")).to_json(
+        filename, orient="records", lines=True, force_ascii=False)
+    print(f"  - Saved {len(notifications_df)} branch notifications to {filename}")
@@ -0,0 +1,137 @@
+# nowcast.py
+import argparse
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+import requests
+
+from src.alerts import run_alerts
+from src.utils import DB_FILE, sql_rows
+from src.weather_scraper import BRANCH_CSV_PATH, FORECAST_API_URL, MINUTELY_15_VARIABLES, WMO_WEATHER_CODES
+
+# --- CONFIGURATION ---
+NOWCAST_TIMEZONE = "Asia/Ho_Chi_Minh"  # all branches are in one timezone; intervals are stored in local time
+INTERVAL = timedelta(minutes=15)
+RAIN_THRESHOLD_MM = 0.1                # same threshold as analyze_precipitation_summary
+INTERVAL_FORMAT = "%Y-%m-%d %H:%M"
+
+NOWCAST_COLUMNS = ["branch", "interval_start"] + MINUTELY_15_VARIABLES + ["weather_condition", "fetched_at"]
+
+# --- STORAGE ---
+
+def setup_nowcast_table(conn):
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS nowcast_15min (
+            branch TEXT NOT NULL, interval_start TIMESTAMP NOT NULL,
+            {", ".join(f"{v} REAL" for v in MINUTELY_15_VARIABLES)},
+            weather_condition TEXT, fetched_at TIMESTAMP,
+            PRIMARY KEY (branch, interval_start)
+        ) WITHOUT ROWID
+    ''')
+    # Cross-branch "last N intervals" queries filter on time only
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_nowcast_interval ON nowcast_15min (interval_start)')
+
+def load_last_intervals(conn):
+    """The last stored interval_start per branch (served from the primary key)."""
+    cursor = conn.execute("SELECT branch, MAX(interval_start) FROM nowcast_15min GROUP BY branch")
+    return {branch: datetime.strptime(last, INTERVAL_FORMAT) for branch, last in cursor.fetchall()}
+
+def upsert_intervals(conn, branch, df):
+    """Inserts new intervals and overwrites revised values of already stored ones."""
+    if df.empty:
+        return 0
+    rows = df.assign(branch=branch, fetched_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    rows["interval_start"] = rows["datetime"].dt.strftime(INTERVAL_FORMAT)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in NOWCAST_COLUMNS[2:])
+    conn.executemany(f'''
+        INSERT INTO nowcast_15min ({", ".join(NOWCAST_COLUMNS)}) VALUES ({", ".join("?" * len(NOWCAST_COLUMNS))})
+        ON CONFLICT (branch, interval_start) DO UPDATE SET {updates}
+    ''', sql_rows(rows, NOWCAST_COLUMNS))
+    return len(rows)
+
+# --- FETCHING ---
+
+def _floor_interval(ts):
+    return ts.replace(minute=ts.minute - ts.minute % 15, second=0, microsecond=0)
+
+def fetch_15min_window(latitude, longitude, start, end):
+    """Fetches the minutely_15 series for [start, end] (local, naive datetimes) only."""
+    params = {
+        "latitude": latitude, "longitude": longitude, "minutely_15": ",".join(MINUTELY_15_VARIABLES),
+        "start_minutely_15": start.strftime("%Y-%m-%dT%H:%M"), "end_minutely_15": end.strftime("%Y-%m-%dT%H:%M"),
+        "timezone": NOWCAST_TIMEZONE,
+    }
+    try:
+        response = requests.get(FORECAST_API_URL, params=params)
+        response.raise_for_status()
+        df = pd.DataFrame(response.json()['minutely_15'])
+        df.rename(columns={'time': 'datetime'}, inplace=True)
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        df['weather_condition'] = df['weathercode'].map(WMO_WEATHER_CODES).fillna('Unknown')
+        return df[(df['datetime'] >= start) & (df['datetime'] <= end)].copy()
+    except (requests.exceptions.RequestException, KeyError) as e:
+        print(f"    -> Nowcast API Error: {e}")
+    return None
+
+def run_nowcast_poll(locations_df, db_file=DB_FILE, now=None):
+    """
+    Fetches only the intervals after each branch's last stored one (re-fetching that last one,
+    which may have been revised) and upserts them. A branch with no history starts at midnight.
+    """
+    print("\n--- Starting Nowcast Poll (15-minute intervals) ---")
+    now = now or pd.Timestamp.now(tz=NOWCAST_TIMEZONE).tz_localize(None).to_pydatetime()
+    end = _floor_interval(now)
+    with sqlite3.connect(db_file) as conn:
+        setup_nowcast_table(conn)
+        last_intervals = load_last_intervals(conn)
+        for _, row in locations_df.iterrows():
+            branch_name = row['branch']
+            start = last_intervals.get(branch_name, now.replace(hour=0, minute=0, second=0, microsecond=0))
+            if start > end:
+                continue
+            weather_df = fetch_15min_window(row['latitude'], row['longitude'], start, end)
+            if weather_df is None:
+                print(f"  Failed for {branch_name}.")
+                continue
+            n = upsert_intervals(conn, branch_name, weather_df)
+            print(f"-> {branch_name}: upserted {n} intervals ({start.strftime('%H:%M')} to {end.strftime('%H:%M')})")
+            conn.commit()
+
+# --- QUERIES ---
+
+def rain_in_last_intervals(conn, n_intervals=4, threshold=RAIN_THRESHOLD_MM, now=None):
+    """
+    Per-branch rain over the last `n_intervals` 15-minute intervals: total and peak precipitation
+    and how many intervals were rainy. Uses the interval_start index, so it stays cheap to poll.
+    """
+    now = now or pd.Timestamp.now(tz=NOWCAST_TIMEZONE).tz_localize(None).to_pydatetime()
+    since = (_floor_interval(now) - INTERVAL * (n_intervals - 1)).strftime(INTERVAL_FORMAT)
+    return pd.read_sql_query('''
+        SELECT branch, COUNT(*) AS intervals, SUM(precipitation > ?) AS rainy_intervals,
+               ROUND(SUM(precipitation), 2) AS total_precip_mm, MAX(precipitation) AS peak_precip_mm,
+               MAX(interval_start) AS last_interval
+        FROM nowcast_15min WHERE interval_start >= ?
+        GROUP BY branch ORDER BY total_precip_mm DESC
+    ''', conn, params=[threshold, since])
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental 15-minute nowcast polling into SQLite.")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file")
+    parser.add_argument("--rain-last", type=int, metavar="N", help="only report rain in the last N intervals")
+    args = parser.parse_args()
+
+    if args.rain_last is None:
+        run_nowcast_poll(pd.read_csv(BRANCH_CSV_PATH), args.db)
+        # Only intervals that are new or were revised by this poll are re-evaluated
+        for alert in run_alerts(args.db, ["nowcast"])["message"]:
+            print(f"  -> {alert}")
+        return
+    with sqlite3.connect(args.db) as conn:
+        setup_nowcast_table(conn)
+        rain = rain_in_last_intervals(conn, args.rain_last)
+    print(rain[rain["rainy_intervals"] > 0].to_string(index=False) if (rain["rainy_intervals"] > 0).any()
+          else f"No rain in the last {args.rain_last} intervals.")
+
+if __name__ == "__main__":
+    main()
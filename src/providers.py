@@ -0,0 +1,201 @@
+# providers.py
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+from src.delta import page_hash
+from src.spatial import cluster_coordinates
+from src.scraper import DAY_LABELS, LOCATIONS, fetch_forecast_page, parse_hourly_page
+from src.weather_scraper import FORECAST_API_URL
+
+# --- CONFIGURATION ---
+FORECAST_TIMEZONE = "Asia/Ho_Chi_Minh"
+SCRAPE_WORKERS = 8             # concurrent AccuWeather page downloads
+OPEN_METEO_BATCH_SIZE = 50     # locations per Open-Meteo request (comma-separated coordinates)
+OPEN_METEO_HOURLY_VARIABLES = [
+    "temperature_2m", "relativehumidity_2m", "precipitation", "weathercode",
+    "windspeed_10m", "winddirection_10m", "uv_index"
+]
+OPEN_METEO_RAIN_MM = 0.2       # hourly precipitation that counts as rain even if the weathercode doesn't say so
+
+# AccuWeather-style Vietnamese phrases for WMO codes; each phrase classifies (src.conditions) to the same
+# condition and rain intensity as its code, so both providers' rows get consistent levels
+WMO_PHRASES_VI = {
+    0: "Quang mây", 1: "Ít mây", 2: "Mây từng đợt", 3: "Nhiều mây", 45: "Sương mù", 48: "Sương mù",
+    51: "Mưa phùn", 53: "Mưa phùn", 55: "Mưa phùn", 56: "Mưa phùn", 57: "Mưa phùn",
+    61: "Mưa nhỏ", 63: "Mưa", 65: "Mưa to", 66: "Mưa", 67: "Mưa to",
+    80: "Mưa rào nhẹ", 81: "Mưa rào", 82: "Mưa rào lớn",
+    95: "Mưa dông", 96: "Mưa dông", 99: "Mưa dông mạnh",
+}
+WIND_DIRECTIONS_VI = ["B", "BĐB", "ĐB", "ĐĐB", "Đ", "ĐĐN", "ĐN", "NĐN",
+                      "N", "NTN", "TN", "TTN", "T", "TTB", "TB", "BTB"]
+UV_LEVELS_VI = [(3, "Thấp"), (6, "Trung bình"), (8, "Cao"), (11, "Rất cao"), (float("inf"), "Cực cao")]
+
+# --- PROVIDERS ---
+# A provider's fetch(branches_df) returns {branch_id: {day_code: (source_hash, parse)}} where
+# branch_id is the row's position in branches_df and parse() returns the day's hourly rows in the
+# scraper's schema (hour, temperature, content, wind, humidity, uv_index).
+
+class AccuWeatherProvider:
+    """
+    Scrapes the hourly AccuWeather pages of each branch's forecast location (one download per
+    location/day). Uses the `forecast_location` column when present, else `district`.
+    """
+    name = "accuweather"
+
+    def __init__(self, locations=None, workers=SCRAPE_WORKERS):
+        self.locations = locations if locations is not None else LOCATIONS
+        self.workers = workers
+
+    def _fetch_page(self, district, day):
+        url = self.locations[district].format(day)
+        try:
+            html = fetch_forecast_page(url)
+        except requests.RequestException as e:
+            print(f"    [ERROR] Could not scrape {district} for day {day}. Reason: {e}")
+            return None
+        # Branches in the same district share the page, so parse it at most once
+        return page_hash(html), functools.cache(lambda: parse_hourly_page(html))
+
+    def fetch(self, branches_df):
+        column = "forecast_location" if "forecast_location" in branches_df else "district"
+        locations = branches_df[column].tolist()
+        for branch, location in zip(branches_df["branch"], locations):
+            if not location or location not in self.locations:
+                print(f"Skipping branch '{branch}' - forecast location '{location}' not found or not supported.")
+        wanted = {location for location in locations if location in self.locations}
+
+        keys = [(location, day) for location in sorted(wanted) for day in DAY_LABELS]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pages = dict(zip(keys, pool.map(lambda key: self._fetch_page(*key), keys)))
+
+        sources = {}
+        for branch_id, location in enumerate(locations):
+            if location in wanted:
+                days = {day: pages[(location, day)] for day in DAY_LABELS if pages[(location, day)]}
+                if days:
+                    sources[branch_id] = days
+        return sources
+
+
+def _wind_text(speed, direction):
+    if pd.isna(speed):
+        return ""
+    if pd.isna(direction):
+        return f"{speed:.0f} km/h"
+    return f"{WIND_DIRECTIONS_VI[int((direction % 360) / 22.5 + 0.5) % 16]} {speed:.0f} km/h"
+
+def _uv_text(uv):
+    if pd.isna(uv):
+        return ""
+    level = next(label for upper, label in UV_LEVELS_VI if uv < upper)
+    return f"{round(uv, 1):g} ({level})"
+
+def _phrase(code, precipitation):
+    phrase = WMO_PHRASES_VI.get(int(code), "Nhiều mây") if not pd.isna(code) else ""
+    if not pd.isna(precipitation) and precipitation >= OPEN_METEO_RAIN_MM and "Mưa" not in phrase:
+        phrase = "Mưa nhỏ"
+    return phrase
+
+def open_meteo_hourly_rows(hourly, now):
+    """
+    Turns one location's Open-Meteo `hourly` block into {day_code: hourly rows}. Like the
+    AccuWeather pages, day 1 starts at the current hour; rain is derived from weathercode and precipitation.
+    """
+    df = pd.DataFrame(hourly)
+    df["time"] = pd.to_datetime(df["time"])
+    df["day"] = (df["time"].dt.normalize() - pd.Timestamp(now.date())).dt.days + 1
+    df = df[df["day"].isin(list(DAY_LABELS)) & (df["time"] >= pd.Timestamp(now).floor("h"))]
+    days = {}
+    for row in df.itertuples(index=False):
+        days.setdefault(row.day, []).append({
+            "hour": f"{row.time.hour:02d}",
+            "temperature": "" if pd.isna(row.temperature_2m) else f"{row.temperature_2m:.0f}°",
+            "content": _phrase(row.weathercode, row.precipitation),
+            "wind": _wind_text(row.windspeed_10m, row.winddirection_10m),
+            "humidity": "" if pd.isna(row.relativehumidity_2m) else f"{row.relativehumidity_2m:.0f}%",
+            "uv_index": _uv_text(row.uv_index),
+        })
+    return days
+
+class OpenMeteoProvider:
+    """
+    Hourly forecasts from Open-Meteo's JSON API at branch coordinates. Nearby branches are clustered
+    and share one location, and many locations go into each request.
+    """
+    name = "open-meteo"
+
+    def __init__(self, batch_size=OPEN_METEO_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def _fetch_batch(self, coords):
+        params = {
+            "latitude": ",".join(f"{lat:.4f}" for lat, _ in coords),
+            "longitude": ",".join(f"{lon:.4f}" for _, lon in coords),
+            "hourly": ",".join(OPEN_METEO_HOURLY_VARIABLES), "forecast_days": len(DAY_LABELS),
+            "timezone": FORECAST_TIMEZONE,
+        }
+        response = requests.get(FORECAST_API_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
+        return data if isinstance(data, list) else [data]
+
+    def fetch(self, branches_df):
+        now = pd.Timestamp.now(tz=FORECAST_TIMEZONE).tz_localize(None)
+        located = branches_df.dropna(subset=["latitude", "longitude"])
+        positions = [branches_df.index.get_loc(i) for i in located.index]
+        labels, centroids = cluster_coordinates(located["latitude"], located["longitude"])
+        coords = [tuple(c) for c in centroids]
+
+        cluster_days = {}
+        for start in range(0, len(coords), self.batch_size):
+            try:
+                results = self._fetch_batch(coords[start:start + self.batch_size])
+            except (requests.RequestException, KeyError, ValueError) as e:
+                print(f"    -> Open-Meteo forecast API Error: {e}")
+                continue
+            for cluster, result in enumerate(results, start):
+                cluster_days[cluster] = {
+                    day: (page_hash(json.dumps(rows, ensure_ascii=False)), (lambda rows=rows: rows))
+                    for day, rows in open_meteo_hourly_rows(result.get("hourly", {"time": []}), now).items()
+                }
+        return {branch_id: cluster_days[cluster] for branch_id, cluster in zip(positions, labels)
+                if cluster_days.get(cluster)}
+
+
+class FanOutProvider:
+    """
+    Runs several providers concurrently and merges their output per (branch, day):
+    the first provider that has a day wins, the others fill the days/branches it missed.
+    """
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.name = "+".join(p.name for p in providers)
+
+    def fetch(self, branches_df):
+        with ThreadPoolExecutor(max_workers=len(self.providers)) as pool:
+            results = list(pool.map(lambda p: p.fetch(branches_df), self.providers))
+        merged = {}
+        for sources in results:
+            for branch_id, days in sources.items():
+                for day, source in days.items():
+                    merged.setdefault(branch_id, {}).setdefault(day, source)
+        return merged
+
+PROVIDERS = {
+    "accuweather": AccuWeatherProvider,
+    "open-meteo": OpenMeteoProvider,
+}
+
+def get_provider(name):
+    """`accuweather`, `open-meteo`, or several joined by `+` (e.g. `accuweather+open-meteo`) to fan out and merge."""
+    names = [n.strip() for n in name.split("+") if n.strip()]
+    unknown = [n for n in names if n not in PROVIDERS]
+    if not names or unknown:
+        raise ValueError(f"Unknown forecast provider '{name}'. Choose from: {', '.join(PROVIDERS)} (join with '+').")
+    providers = [PROVIDERS[n]() for n in names]
+    return providers[0] if len(providers) == 1 else FanOutProvider(providers)
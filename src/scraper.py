@@ -1,11 +1,10 @@
 # scraper.py
+import json
+import os
 import re
 import requests
-import pandas as pd
 from bs4 import BeautifulSoup
 
-RAIN_KEYWORDS = ["mưa", "dông", "giông", "mưa rào"]
-
 # Mapping forecast days to labels
 DAY_LABELS = {
     1: "hôm nay",
@@ -31,72 +30,85 @@ LOCATIONS = {
     "TP Vũng Tàu": "https://www.accuweather.com/vi/vn/vung-tau/352089/hourly-weather-forecast/352089?day={}"
 }
 
+# Approximate centre (latitude, longitude) of each forecast location, for spatial assignment
+LOCATION_COORDS = {
+    "Quận 1": (10.7769, 106.7009),
+    "Quận 2": (10.7872, 106.7498),
+    "Quận 3": (10.7843, 106.6844),
+    "Quận 5": (10.7540, 106.6634),
+    "Quận 6": (10.7480, 106.6352),
+    "Quận 8": (10.7240, 106.6286),
+    "Quận 10": (10.7746, 106.6679),
+    "Quận 12": (10.8672, 106.6413),
+    "Bình Thạnh": (10.8106, 106.7091),
+    "Tân Phú": (10.7918, 106.6282),
+    "Tân Bình": (10.8015, 106.6526),
+    "Phú Nhuận": (10.7991, 106.6802),
+    "TP Thủ Đức": (10.8494, 106.7537),
+    "TP Vũng Tàu": (10.3460, 107.0843)
+}
+
+# Overrides, e.g. to point the scraper at the local stand-in server (src/standin.py):
+# WEATHER_ACCUWEATHER_BASE_URL replaces the host of every URL above, and WEATHER_LOCATIONS_FILE
+# (JSON {location: {"url": "...?day={}", "latitude": .., "longitude": ..}}) replaces the locations
+ACCUWEATHER_BASE_URL = "https://www.accuweather.com"
+
+def _override_locations():
+    global LOCATIONS, LOCATION_COORDS
+    base_url = os.environ.get("WEATHER_ACCUWEATHER_BASE_URL")
+    if base_url:
+        LOCATIONS = {name: url.replace(ACCUWEATHER_BASE_URL, base_url.rstrip("/")) for name, url in LOCATIONS.items()}
+    locations_file = os.environ.get("WEATHER_LOCATIONS_FILE")
+    if locations_file:
+        with open(locations_file, encoding="utf-8") as f:
+            locations = json.load(f)
+        LOCATIONS = {name: loc["url"] for name, loc in locations.items()}
+        LOCATION_COORDS = {name: (loc["latitude"], loc["longitude"]) for name, loc in locations.items()
+                           if "latitude" in loc and "longitude" in loc}
+
+_override_locations()
 
 def extract_district(address: str):
     """Extracts a district name from an address string."""
     match = re.search(r"(Quận\s?\d+|Bình Thạnh|Tân Bình|Phú Nhuận|Tân Phú|TP Thủ Đức|TP Vũng Tàu)", address, re.IGNORECASE)
     return match.group(0) if match else None
 
-def scrape_data_for_branch(branch_row, base_url):
-    """Scrapes 3 days of weather data for a branch (by district URL)."""
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/127.0 Safari/537.36"
-        ),
-        "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-    }
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/127.0 Safari/537.36"
+    ),
+    "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+def fetch_forecast_page(url):
+    """Downloads one hourly forecast page and returns its HTML."""
+    res = requests.get(url, headers=HEADERS)
+    res.raise_for_status()
+    return res.text
+
+# What parse_hourly_page raises when a page's markup isn't the expected one (missing elements,
+# empty or unexpected tags); callers skip that page instead of aborting the run
+PARSE_ERRORS = (AttributeError, IndexError, KeyError, TypeError, ValueError)
+
+def parse_hourly_page(html):
+    """Parses the hourly rows (hour, temperature, phrase, wind, humidity, UV) out of a forecast page."""
+    soup = BeautifulSoup(html, "html.parser")
     rows = []
-    for day in range(1, 4):
-        url = base_url.format(day)
-        try:
-            res = requests.get(url, headers=headers)
-            res.raise_for_status()
-            soup = BeautifulSoup(res.text, "html.parser")
-            for hourly in soup.select("div.accordion-item.hour"):
-                hour = hourly.select_one(".date").get_text(strip=True)
-                temp = hourly.select_one(".temp.metric").get_text(strip=True)
-                phrase = hourly.select_one(".phrase").get_text(strip=True)
-                panel_items = hourly.select(".panel.no-realfeel-phrase p")
-                panel_dict = {p.contents[0].strip().replace(":", ""): (p.select_one(".value").get_text(strip=True) if p.select_one(".value") else "") for p in panel_items}
-                
-                rows.append({
-                    "branch": branch_row["branch"],
-                    "address": branch_row["address"],
-                    "latitude": branch_row["latitude"],
-                    "longitude": branch_row["longitude"],
-                    "district": branch_row["district"],
-                    "forecast_day": DAY_LABELS.get(day, str(day)),
-                    "hour": hour,
-                    "temperature": temp, 
-                    "content": phrase,
-                    "wind": panel_dict.get("Gió", ""),
-                    "humidity": panel_dict.get("Độ ẩm", ""),
-                    "uv_index": panel_dict.get("Chỉ số UV tối đa", "")
-                })
-        except (requests.RequestException, AttributeError) as e:
-            print(f"    [ERROR] Could not scrape {branch_row['branch']} ({branch_row['district']}) for day {day}. Reason: {e}")
-            continue
-    return pd.DataFrame(rows)
+    for hourly in soup.select("div.accordion-item.hour"):
+        hour = hourly.select_one(".date").get_text(strip=True)
+        temp = hourly.select_one(".temp.metric").get_text(strip=True)
+        phrase = hourly.select_one(".phrase").get_text(strip=True)
+        panel_items = hourly.select(".panel.no-realfeel-phrase p")
+        panel_dict = {p.contents[0].strip().replace(":", ""): (p.select_one(".value").get_text(strip=True) if p.select_one(".value") else "") for p in panel_items}
 
-def generate_rain_summary(df):
-    """Generate rain summary per branch/day"""
-    summaries = []
-    if df.empty: return summaries
-    for (branch, forecast_day), group in df.groupby(['branch', 'forecast_day']):
-        rainy_hours = group[group['content'].str.contains('|'.join(RAIN_KEYWORDS), case=False, na=False)]
-        summary = (f"Dự báo cho {branch} ({group['district'].iloc[0]}) {forecast_day}: "
-                   f"Có khả năng mưa vào các giờ: {', '.join(rainy_hours['hour'].tolist())}." 
-                   if not rainy_hours.empty else 
-                   f"Dự báo cho {branch} ({group['district'].iloc[0]}) {forecast_day}: Trời không mưa.")
-        summaries.append({
-            "branch": group["branch"].iloc[0],
-            "address": group["address"].iloc[0],
-            "latitude": group["latitude"].iloc[0],
-            "longitude": group["longitude"].iloc[0],
-            "district": group["district"].iloc[0],
-            "forecast_day": forecast_day,
-            "summary_text": summary
+        rows.append({
+            "hour": hour,
+            "temperature": temp,
+            "content": phrase,
+            "wind": panel_dict.get("Gió", ""),
+            "humidity": panel_dict.get("Độ ẩm", ""),
+            "uv_index": panel_dict.get("Chỉ số UV tối đa", "")
         })
-    return summaries
+    return rows
@@ -0,0 +1,181 @@
+# snapshot.py
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime
+
+from src.maintenance import ARCHIVE_FOLDER
+from src.utils import DB_FILE
+
+# --- CONFIGURATION ---
+SNAPSHOT_FILE = os.path.join("state", "weather_state.tar.gz")
+SNAPSHOT_FORMAT_VERSION = 1      # bump when the layout changes; newer snapshots are refused
+COMPRESS_LEVEL = 6               # gzip: restores quickly, unlike xz
+MANIFEST_NAME = "manifest.json"
+DB_ARCNAME = "db/weather_forecasts.db"
+
+# The DB carries all warm-start state: forecast_versions page/content hashes (delta scraping),
+# nowcast_15min (incremental polling), historical_hourly + backfill_chunks (backfill checkpoints)
+# and alert_inputs (incremental alerts). Aged rows live in the maintenance archive folder.
+SNAPSHOT_FOLDERS = [ARCHIVE_FOLDER]
+
+# --- HELPERS ---
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _table_counts(db_path):
+    with closing(sqlite3.connect(db_path)) as conn:
+        tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        return {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables}
+
+def _folder_files(folder):
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+def _inside(base, name):
+    """The path of archive member `name` under `base`; absolute names and names escaping `base` are refused."""
+    base = os.path.realpath(base)
+    path = os.path.realpath(os.path.join(base, *name.split("/")))
+    if os.path.isabs(name) or ".." in name.split("/") or os.path.commonpath([base, path]) != base:
+        raise ValueError(f"Refusing snapshot entry '{name}': it points outside {base}.")
+    return path
+
+# --- CREATE ---
+
+def create_snapshot(db_file=DB_FILE, snapshot_file=SNAPSHOT_FILE, folders=SNAPSHOT_FOLDERS,
+                    compresslevel=COMPRESS_LEVEL):
+    """
+    Packs a compacted, consistent copy of the DB (VACUUM INTO, safe while other connections are
+    open) and the given folders into one gzip'd tar with a versioned manifest. The file is
+    written to a temporary name and renamed, so an interrupted run never leaves a broken snapshot.
+    """
+    started = time.perf_counter()
+    if not os.path.exists(db_file):
+        raise FileNotFoundError(f"Database {db_file} not found; nothing to snapshot.")
+    os.makedirs(os.path.dirname(snapshot_file) or ".", exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = os.path.join(tmp, "snapshot.db")
+        with closing(sqlite3.connect(db_file)) as conn:
+            conn.execute("VACUUM INTO ?", (db_copy,))
+
+        entries = [(db_copy, DB_ARCNAME)]
+        for folder in folders:
+            for path in _folder_files(folder):
+                arcname = os.path.relpath(path).replace(os.sep, "/")
+                _inside(os.getcwd(), arcname)       # restore puts folders back relative to the working directory
+                entries.append((path, arcname))
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "db_file": db_file,
+            "tables": _table_counts(db_copy),
+            "files": {arcname: {"size": os.path.getsize(path), "sha256": _sha256(path)} for path, arcname in entries},
+        }
+
+        partial = snapshot_file + ".partial"
+        with tarfile.open(partial, "w:gz", compresslevel=compresslevel) as tar:
+            payload = json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")
+            info = tarfile.TarInfo(MANIFEST_NAME)
+            info.size, info.mtime = len(payload), int(time.time())
+            tar.addfile(info, io.BytesIO(payload))      # first member, so restore can check it before extracting
+            for path, arcname in entries:
+                tar.add(path, arcname=arcname)
+        os.replace(partial, snapshot_file)
+
+    raw = sum(f["size"] for f in manifest["files"].values())
+    print(f"Snapshot written to {snapshot_file}: {len(manifest['files'])} files, "
+          f"{raw / 1e6:.1f} MB -> {os.path.getsize(snapshot_file) / 1e6:.1f} MB "
+          f"in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+# --- RESTORE ---
+
+def read_manifest(snapshot_file=SNAPSHOT_FILE):
+    with tarfile.open(snapshot_file, "r:gz") as tar:
+        return json.load(tar.extractfile(MANIFEST_NAME))
+
+def restore_snapshot(snapshot_file=SNAPSHOT_FILE, db_file=DB_FILE, if_missing=False):
+    """
+    Restores the DB and folders from a snapshot. Every file is checked against the manifest's
+    SHA-256 before anything is replaced, and entries that would land outside the working directory
+    (absolute names, "..") are refused; the DB is swapped in with one rename.
+    Returns the manifest, or None when there was nothing to restore (a cold start).
+    """
+    started = time.perf_counter()
+    if not os.path.exists(snapshot_file):
+        print(f"No snapshot at {snapshot_file}; starting cold.")
+        return None
+    if if_missing and os.path.exists(db_file):
+        print(f"{db_file} already exists; keeping it (--if-missing).")
+        return None
+
+    target_dir = os.path.dirname(os.path.abspath(db_file))
+    with tarfile.open(snapshot_file, "r:gz") as tar, tempfile.TemporaryDirectory(dir=target_dir) as tmp:
+        manifest = json.load(tar.extractfile(MANIFEST_NAME))
+        version = manifest.get("format_version")
+        if not isinstance(version, int) or version > SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Snapshot format {version} is newer than supported ({SNAPSHOT_FORMAT_VERSION}); "
+                             f"update the code before restoring {snapshot_file}.")
+
+        members = [m for m in tar.getmembers() if m.name != MANIFEST_NAME]
+        for member in members:
+            if member.name not in manifest["files"] or not member.isfile():
+                raise ValueError(f"Unexpected entry '{member.name}' in {snapshot_file}.")
+            _inside(os.getcwd(), member.name)
+            path = _inside(tmp, member.name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with tar.extractfile(member) as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            if _sha256(path) != manifest["files"][member.name]["sha256"]:
+                raise ValueError(f"Checksum mismatch for '{member.name}' in {snapshot_file}.")
+
+        # Everything verified: move the files into place
+        for member in members:
+            path = _inside(tmp, member.name)
+            if member.name == DB_ARCNAME:
+                for suffix in ("-wal", "-shm"):     # a leftover WAL would be replayed onto the restored DB
+                    if os.path.exists(db_file + suffix):
+                        os.remove(db_file + suffix)
+                os.replace(path, db_file)
+            else:
+                destination = _inside(os.getcwd(), member.name)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.move(path, destination)
+
+    print(f"Restored snapshot from {manifest['created_at']} ({len(members)} files, "
+          f"{sum(manifest['tables'].values())} rows in {len(manifest['tables'])} tables) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot/restore the DB and incremental state (e.g. between CI runs).")
+    parser.add_argument("action", choices=["create", "restore", "info"])
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file")
+    parser.add_argument("--file", default=SNAPSHOT_FILE, help="snapshot file")
+    parser.add_argument("--if-missing", action="store_true", help="restore only when the DB does not exist yet")
+    args = parser.parse_args()
+
+    if args.action == "create":
+        create_snapshot(args.db, args.file)
+    elif args.action == "restore":
+        restore_snapshot(args.file, args.db, args.if_missing)
+    else:
+        print(json.dumps({k: v for k, v in read_manifest(args.file).items() if k != "files"}, ensure_ascii=False, indent=1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# spatial.py
+import numpy as np
+import pandas as pd
+
+from src.scraper import LOCATION_COORDS, extract_district
+
+# --- CONFIGURATION ---
+MAX_ASSIGN_KM = 25.0     # branches further than this from every forecast point fall back to the address
+CLUSTER_CELL_KM = 2.0    # branches in the same cell share one coordinate-based fetch
+QUERY_CHUNK = 4096       # rows per brute-force distance block
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON_EQUATOR = 111.320
+
+def project_km(latitude, longitude, ref_latitude):
+    """Equirectangular projection to kilometres; accurate enough at city scale."""
+    lat = np.asarray(latitude, dtype=float)
+    lon = np.asarray(longitude, dtype=float)
+    x = lon * KM_PER_DEG_LON_EQUATOR * np.cos(np.radians(ref_latitude))
+    return np.column_stack([x, lat * KM_PER_DEG_LAT])
+
+class ForecastPointIndex:
+    """Nearest-forecast-point lookup over named coordinates; a chunked brute-force search, fast for a few hundred points."""
+
+    def __init__(self, points=None):
+        points = points if points is not None else LOCATION_COORDS
+        self.names = np.array(list(points), dtype=object)
+        coords = np.array(list(points.values()), dtype=float)
+        self.ref_latitude = float(coords[:, 0].mean())
+        self.xy = project_km(coords[:, 0], coords[:, 1], self.ref_latitude)
+
+    def query(self, latitude, longitude):
+        """Returns (point names, distances in km) for arrays of coordinates; NaN coordinates give (None, inf)."""
+        xy = project_km(latitude, longitude, self.ref_latitude)
+        valid = ~np.isnan(xy).any(axis=1)
+        idx = np.zeros(len(xy), dtype=np.intp)
+        dist = np.full(len(xy), np.inf)
+        rows = np.flatnonzero(valid)
+        for start in range(0, len(rows), QUERY_CHUNK):
+            chunk = rows[start:start + QUERY_CHUNK]
+            d2 = ((xy[chunk, None, :] - self.xy[None, :, :]) ** 2).sum(axis=2)
+            idx[chunk] = d2.argmin(axis=1)
+            dist[chunk] = np.sqrt(d2[np.arange(len(chunk)), idx[chunk]])
+        names = self.names[idx].copy()
+        names[~valid] = None
+        return names, dist
+
+def assign_forecast_locations(branches_df, index=None, max_km=MAX_ASSIGN_KM, nearest=False):
+    """
+    The forecast location for each branch: the district parsed from its address. With `nearest`,
+    the nearest forecast point by coordinates instead (still the address district when coordinates
+    are missing or too far from every point). LOCATION_COORDS are approximate district centres,
+    so every branch moved off its address district is logged.
+    """
+    address = branches_df["address"].apply(extract_district)
+    if not nearest:
+        return address
+    index = index or ForecastPointIndex()
+    names, dist = index.query(branches_df["latitude"], branches_df["longitude"])
+    closest = pd.Series(names, index=branches_df.index, dtype=object)
+    locations = closest.where(dist <= max_km, address)
+    moved = address.notna() & (locations != address)
+    for branch, district, location, km in zip(branches_df["branch"][moved], address[moved], locations[moved], dist[moved]):
+        print(f"  [LOCATION] {branch}: address is in {district}, forecasts come from {location} ({km:.1f} km away)")
+    return locations
+
+def cluster_coordinates(latitude, longitude, cell_km=CLUSTER_CELL_KM):
+    """
+    Groups nearby coordinates by snapping them to a `cell_km` grid. Returns (labels, centroids)
+    where labels[i] is the cluster of point i and centroids is an array of (lat, lon) per cluster.
+    """
+    lat = np.asarray(latitude, dtype=float)
+    lon = np.asarray(longitude, dtype=float)
+    if not len(lat):
+        return np.zeros(0, dtype=np.intp), np.zeros((0, 2))
+    cells = np.floor(project_km(lat, lon, float(np.nanmean(lat))) / cell_km).astype(np.int64)
+    # One int64 key per cell; 1-D unique is much faster than unique(axis=0)
+    _, labels = np.unique((cells[:, 0] << 32) + (cells[:, 1] & 0xFFFFFFFF), return_inverse=True)
+    labels = labels.reshape(-1)
+    counts = np.bincount(labels)
+    centroids = np.column_stack([np.bincount(labels, lat) / counts, np.bincount(labels, lon) / counts])
+    return labels, centroids
@@ -0,0 +1,274 @@
+# standin.py
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+STANDIN_HOST = "127.0.0.1"
+STANDIN_PORT = 8765
+STANDIN_TIMEZONE = "Asia/Ho_Chi_Minh"
+FIXTURES_FOLDER = "loadtest"
+
+# Synthetic locations and branches are spread over roughly the HCMC area
+AREA_LAT = (10.60, 11.00)
+AREA_LON = (106.50, 106.90)
+BRANCH_OFFSET_DEG = 0.005        # branches sit within ~500 m of their location
+
+HOURLY_PATH = "/vi/vn/{slug}/{id}/hourly-weather-forecast/{id}"
+PHRASES_DRY = ["Nắng", "Có nắng", "Ít mây", "Có mây", "Nhiều mây"]
+PHRASES_RAIN = ["Mưa rào", "Mưa nhỏ", "Mưa", "Mưa dông"]
+WIND_DIRECTIONS = ["B", "ĐB", "Đ", "ĐN", "N", "TN", "T", "TB"]
+UV_LEVELS = ["Thấp", "Thấp", "Thấp", "Trung bình", "Trung bình", "Trung bình", "Cao", "Cao", "Rất cao"]
+
+# --- SYNTHETIC WEATHER ---
+# Every value is a pure function of (location key, timestamp, version), so repeated or overlapping
+# requests agree with each other and unchanged forecasts hash the same between scrapes.
+
+def _unit_noise(key, ticks, salt):
+    """Deterministic uniform [0, 1) noise per (key, tick) from an integer hash."""
+    x = (np.asarray(ticks, dtype=np.uint64) * np.uint64(2654435761)
+         + np.uint64((key * 40503 + salt * 97) & 0xFFFFFFFF))
+    x ^= x >> np.uint64(13)
+    x *= np.uint64(0x5BD1E995)
+    x ^= x >> np.uint64(15)
+    return (x & np.uint64(0xFFFFFF)).astype(np.float64) / float(1 << 24)
+
+def synthetic_series(key, times, variables, version=0):
+    """Open-Meteo style values for `variables` at `times` (a DatetimeIndex) for one location key."""
+    ticks = (times.asi8 // 60_000_000_000) + version * 7919   # minutes since epoch
+    hour = times.hour.to_numpy() + times.minute.to_numpy() / 60
+    daily = np.sin(2 * np.pi * (hour - 9) / 24)
+    wet = _unit_noise(key, ticks // 60, 1) < 0.12 + 0.1 * (hour >= 15)
+    precipitation = np.where(wet, np.round(-np.log(1 - _unit_noise(key, ticks, 2)) * 1.5, 1), 0.0)
+    cloud = np.clip(np.where(wet, 85, 40) + 30 * (_unit_noise(key, ticks // 60, 3) - 0.5), 0, 100)
+    code = np.select([precipitation >= 8, precipitation >= 4, precipitation >= 1, precipitation > 0, cloud > 70, cloud > 35],
+                     [95, 65, 63, 61, 3, 2], 1)
+    values = {
+        "temperature_2m": 28.5 + 3.5 * daily - 2 * wet,
+        "apparent_temperature": 31.5 + 4.5 * daily - 2 * wet,
+        "relativehumidity_2m": np.clip(72 - 14 * daily + 15 * wet, 30, 100),
+        "precipitation": precipitation, "rain": precipitation,
+        "weathercode": code, "cloudcover": cloud,
+        "windspeed_10m": 5 + 15 * _unit_noise(key, ticks // 60, 4),
+        "winddirection_10m": 360 * _unit_noise(key, ticks // 180, 5),
+        "uv_index": np.clip(9 * daily, 0, None) * (1 - cloud / 200),
+    }
+    return {v: np.round(values.get(v, np.zeros(len(times))), 1).tolist() for v in variables}
+
+def hourly_page(location_id, day, now, version=0):
+    """An AccuWeather-like hourly page (div.accordion-item.hour markup); day 1 starts at the current hour."""
+    start = pd.Timestamp(now.date()) + pd.Timedelta(days=day - 1)
+    times = pd.date_range(start, periods=24, freq="h")
+    if day == 1:
+        times = times[times >= pd.Timestamp(now).floor("h")]
+    series = synthetic_series(location_id, times, ["temperature_2m", "relativehumidity_2m", "precipitation",
+                                                   "windspeed_10m", "winddirection_10m", "uv_index"], version)
+    items = []
+    for i, t in enumerate(times):
+        rain = series["precipitation"][i] > 0
+        phrases = PHRASES_RAIN if rain else PHRASES_DRY
+        phrase = phrases[int(series["windspeed_10m"][i] * 7) % len(phrases)]
+        wind = f"{WIND_DIRECTIONS[int(series['winddirection_10m'][i] / 45) % 8]} {series['windspeed_10m'][i]:.0f} km/h"
+        uv = series["uv_index"][i]
+        items.append(
+            f'<div class="accordion-item hour"><div class="date">{t.hour:02d}</div>'
+            f'<div class="temp metric">{series["temperature_2m"][i]:.0f}°</div><div class="phrase">{phrase}</div>'
+            f'<div class="panel no-realfeel-phrase"><p>Gió: <span class="value">{wind}</span></p>'
+            f'<p>Độ ẩm: <span class="value">{series["relativehumidity_2m"][i]:.0f}%</span></p>'
+            f'<p>Chỉ số UV tối đa: <span class="value">{uv:.0f} ({UV_LEVELS[min(int(uv), 8)]})</span></p></div></div>')
+    return f"<html><body><div class=\"hourly-wrapper\">{''.join(items)}</div></body></html>"
+
+def _coordinate_key(latitude, longitude):
+    return zlib.crc32(f"{latitude:.4f},{longitude:.4f}".encode())
+
+def _time_range(params, resolution, now):
+    """The requested time axis: explicit start/end (minutely_15 or date), forecast_days, or today."""
+    if resolution == "minutely_15" and "start_minutely_15" in params:
+        return pd.date_range(params["start_minutely_15"], params["end_minutely_15"], freq="15min")
+    freq = "15min" if resolution == "minutely_15" else "h"
+    if "start_date" in params:
+        start = pd.Timestamp(params["start_date"])
+        end = pd.Timestamp(params.get("end_date", params["start_date"])) + pd.Timedelta(days=1)
+    else:
+        start = pd.Timestamp(now.date())
+        end = start + pd.Timedelta(days=int(params.get("forecast_days", 7)))
+    return pd.date_range(start, end, freq=freq, inclusive="left")
+
+def open_meteo_payload(params, now, version=0):
+    """Open-Meteo archive/forecast JSON for one or many (comma-separated) coordinates."""
+    latitudes = [float(v) for v in params["latitude"].split(",")]
+    longitudes = [float(v) for v in params["longitude"].split(",")]
+    if len(latitudes) != len(longitudes):
+        raise ValueError("latitude and longitude must have the same number of values")
+    timezone = params.get("timezone", "GMT")
+    timezone = STANDIN_TIMEZONE if timezone == "auto" else timezone
+    results = []
+    for lat, lon in zip(latitudes, longitudes):
+        result = {"latitude": lat, "longitude": lon, "timezone": timezone, "utc_offset_seconds": 25200}
+        for resolution in ("hourly", "minutely_15"):
+            if resolution in params:
+                times = _time_range(params, resolution, now)
+                series = synthetic_series(_coordinate_key(lat, lon), times, params[resolution].split(","), version)
+                result[resolution] = {"time": times.strftime("%Y-%m-%dT%H:%M").tolist(), **series}
+        results.append(result)
+    return results if len(results) > 1 else results[0]
+
+# --- SERVER ---
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves /vi/vn/.../hourly-weather-forecast/<id>?day=N, /v1/forecast, /v1/archive and /stats."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency_ms = 0.0
+    jitter_ms = 0.0
+    error_rate = 0.0
+    change_minutes = 0           # 0: forecasts never change; N: a new forecast "version" every N minutes
+    stats = None
+    stats_lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/stats":
+            with self.stats_lock:
+                stats = dict(self.stats)
+            stats["requests_per_second"] = round(stats["requests"] / max(time.monotonic() - stats.pop("started"), 1e-9), 1)
+            return self._send(200, json.dumps(stats), "application/json")
+
+        route = ("archive" if url.path == "/v1/archive" else "forecast" if url.path == "/v1/forecast"
+                 else "hourly" if "/hourly-weather-forecast/" in url.path else None)
+        self._count(route or "not_found")
+        if route is None:
+            return self._send(404, json.dumps({"error": True, "reason": f"Unknown path {url.path}"}), "application/json")
+
+        delay = random.gauss(self.latency_ms, self.jitter_ms) / 1000 if self.latency_ms or self.jitter_ms else 0
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < self.error_rate:
+            self._count("errors")
+            return self._send(503, json.dumps({"error": True, "reason": "Injected error"}), "application/json")
+
+        now = pd.Timestamp.now(tz=STANDIN_TIMEZONE).tz_localize(None).to_pydatetime()
+        version = int(time.time() // (self.change_minutes * 60)) if self.change_minutes else 0
+        try:
+            if route == "hourly":
+                location_id = int(url.path.rstrip("/").rsplit("/", 1)[1])
+                body = hourly_page(location_id, int(params.get("day", 1)), now, version)
+                return self._send(200, body, "text/html")
+            return self._send(200, json.dumps(open_meteo_payload(params, now, version)), "application/json")
+        except (KeyError, ValueError) as e:
+            return self._send(400, json.dumps({"error": True, "reason": str(e)}), "application/json")
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _send(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def create_standin_server(host=STANDIN_HOST, port=STANDIN_PORT, latency_ms=0.0, jitter_ms=0.0,
+                          error_rate=0.0, change_minutes=0):
+    """Builds (but does not start) the stand-in server with its own settings and counters."""
+    handler = type("ConfiguredStandInHandler", (StandInHandler,), {
+        "latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate,
+        "change_minutes": change_minutes, "stats": {"requests": 0, "started": time.monotonic()},
+        "stats_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+# --- FIXTURES ---
+
+def write_fixtures(folder=FIXTURES_FOLDER, n_branches=100, n_locations=20, base_url=None, seed=0):
+    """
+    Writes locations.json (forecast locations on the stand-in server) and branches.csv
+    (branches placed around those locations) and returns the environment to point the pipeline at them.
+    """
+    base_url = base_url or f"http://{STANDIN_HOST}:{STANDIN_PORT}"
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+
+    side = int(np.ceil(np.sqrt(n_locations)))
+    cells = rng.permutation(side * side)[:n_locations]
+    lat = AREA_LAT[0] + (cells // side + rng.random(n_locations)) / side * (AREA_LAT[1] - AREA_LAT[0])
+    lon = AREA_LON[0] + (cells % side + rng.random(n_locations)) / side * (AREA_LON[1] - AREA_LON[0])
+    locations = {
+        f"Khu vực {i + 1}": {
+            "url": base_url + HOURLY_PATH.format(slug=f"khu-vuc-{i + 1}", id=900000 + i) + "?day={}",
+            "latitude": round(float(lat[i]), 5), "longitude": round(float(lon[i]), 5),
+        } for i in range(n_locations)
+    }
+    locations_file = os.path.join(folder, "locations.json")
+    with open(locations_file, "w", encoding="utf-8") as f:
+        json.dump(locations, f, ensure_ascii=False, indent=1)
+
+    home = rng.integers(0, n_locations, n_branches)
+    branches = pd.DataFrame({
+        "branch": [f"CHI NHÁNH {i + 1}" for i in range(n_branches)],
+        "address": [f"{i + 1} Đường số {home[i] + 1}, Khu vực {home[i] + 1}" for i in range(n_branches)],
+        "latitude": np.round(lat[home] + rng.uniform(-BRANCH_OFFSET_DEG, BRANCH_OFFSET_DEG, n_branches), 6),
+        "longitude": np.round(lon[home] + rng.uniform(-BRANCH_OFFSET_DEG, BRANCH_OFFSET_DEG, n_branches), 6),
+    })
+    branches_file = os.path.join(folder, "branches.csv")
+    branches.to_csv(branches_file, index=False, encoding="utf-8")
+
+    return {
+        "WEATHER_LOCATIONS_FILE": os.path.abspath(locations_file),
+        "WEATHER_BRANCHES_FILE": os.path.abspath(branches_file),
+        "WEATHER_FORECAST_API_URL": f"{base_url}/v1/forecast",
+        "WEATHER_ARCHIVE_API_URL": f"{base_url}/v1/archive",
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in AccuWeather/Open-Meteo server for offline load tests.")
+    parser.add_argument("--host", default=STANDIN_HOST)
+    parser.add_argument("--port", type=int, default=STANDIN_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="standard deviation of the added latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--change-minutes", type=int, default=0, help="publish a new forecast every N minutes (0: never)")
+    parser.add_argument("--write-fixtures", metavar="FOLDER", help="write locations.json + branches.csv and exit")
+    parser.add_argument("--branches", type=int, default=100, help="synthetic branches for --write-fixtures")
+    parser.add_argument("--locations", type=int, default=20, help="synthetic forecast locations for --write-fixtures")
+    args = parser.parse_args()
+
+    if args.write_fixtures:
+        env = write_fixtures(args.write_fixtures, args.branches, args.locations, f"http://{args.host}:{args.port}")
+        print(f"Wrote {args.locations} locations and {args.branches} branches to {args.write_fixtures}. "
+              f"Point the pipeline at the stand-in server with:")
+        for key, value in env.items():
+            print(f"  export {key}={value}")
+        return
+
+    server = create_standin_server(args.host, args.port, args.latency_ms, args.jitter_ms,
+                                   args.error_rate, args.change_minutes)
+    print(f"Serving stand-in weather endpoints on http://{args.host}:{args.port} "
+          f"(latency {args.latency_ms}±{args.jitter_ms} ms, error rate {args.error_rate:.1%}, /stats for counters)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping stand-in server.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
 import sqlite3
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
+
+from src.conditions import rain_label, with_conditions
 
 DB_FILE = "weather_forecasts.db"
 CSV_OUTPUT_FOLDER = "weather_reports"
@@ -12,8 +15,6 @@ DAY_LABELS = {
     3: "2 ngày tới"
 }
 
-RAIN_KEYWORDS = ["mưa", "dông", "giông", "mưa rào"]
-
 def setup_database_and_folders():
     """Create DB tables + CSV folder if missing"""
     if not os.path.exists(CSV_OUTPUT_FOLDER):
@@ -37,27 +38,89 @@ def setup_database_and_folders():
                 forecast_day TEXT, summary_text TEXT
             )
         ''')
+        # One row per (scrape, branch, forecast day); data_scraped_at points at the scrape whose
+        # weather_data/daily_summaries rows hold the content, so unchanged forecasts reuse older rows
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forecast_versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, scraped_at TIMESTAMP,
+                branch TEXT, district TEXT, forecast_day TEXT, forecast_date DATE,
+                page_hash TEXT, content_hash TEXT, data_scraped_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_forecast_versions_branch_day ON forecast_versions (branch, forecast_day, id)')
+        # Latest-scrape lookups (query API) filter on branch + scraped_at
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_weather_data_branch_scraped ON weather_data (branch, scraped_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_summaries_branch_scraped ON daily_summaries (branch, scraped_at)')
+
+WEATHER_COLUMNS = ['scraped_at','branch','address','latitude','longitude','district',
+                   'forecast_day','hour','temperature','content','wind','humidity','uv_index']
+SUMMARY_COLUMNS = ['scraped_at','branch','address','latitude','longitude','district',
+                   'forecast_day','summary_text']
 
-def ingest_to_database(conn, weather_df, summaries_list):
+def sql_rows(df, cols):
+    """
+    df[cols] as executemany parameter tuples, missing values as None. Producers build these before
+    submitting a SQLiteWriter job, so the writer thread only runs executemany and commits.
+    """
+    values = df[cols].to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    return list(map(tuple, values))
+
+def insert_rows(conn, table, cols, rows):
+    """Plain INSERTs without committing, so callers (e.g. the writer thread) control the transaction"""
+    conn.executemany(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", rows)
+
+def ingestion_rows(weather_df, summaries_list, scraped_at=None):
+    """(weather_data rows, daily_summaries rows) stamped with scraped_at, as sql_rows() tuples"""
+    scraped_at_timestamp = scraped_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+    weather_rows = sql_rows(weather_df.assign(scraped_at=scraped_at_timestamp), WEATHER_COLUMNS) \
+        if not weather_df.empty else []
+    summary_rows = sql_rows(pd.DataFrame(summaries_list).assign(scraped_at=scraped_at_timestamp), SUMMARY_COLUMNS) \
+        if summaries_list else []
+    return weather_rows, summary_rows
+
+def ingest_to_database(conn, weather_df, summaries_list, scraped_at=None):
     """Insert weather + summaries into DB"""
-    scraped_at_timestamp = datetime.now()
+    weather_rows, summary_rows = ingestion_rows(weather_df, summaries_list, scraped_at)
+    insert_rows(conn, 'weather_data', WEATHER_COLUMNS, weather_rows)
+    insert_rows(conn, 'daily_summaries', SUMMARY_COLUMNS, summary_rows)
 
-    if not weather_df.empty:
-        weather_df['scraped_at'] = scraped_at_timestamp
-        cols = ['scraped_at','branch','address','latitude','longitude','district',
-                'forecast_day','hour','temperature','content','wind','humidity','uv_index']
-        weather_df[cols].to_sql('weather_data', conn, if_exists='append', index=False)
+def query_latest_forecast(conn, branch=None, district=None, day=None, today=None):
+    """
+    Hourly rows from the most recent stored scrape of each branch and forecast day. Day labels are
+    relative to the scrape date, so only scrapes from `today` (default: the current date) count;
+    a branch/day whose scrape failed today is left out rather than served from an older date.
+    """
+    sql = f'''
+        SELECT {", ".join("w." + c for c in WEATHER_COLUMNS)} FROM weather_data w
+        JOIN (SELECT branch, forecast_day, MAX(scraped_at) AS latest FROM weather_data
+              WHERE scraped_at >= ? GROUP BY branch, forecast_day) m
+          ON w.branch = m.branch AND w.forecast_day = m.forecast_day AND w.scraped_at = m.latest
+        WHERE 1 = 1
+    '''
+    params = [(today or date.today()).isoformat()]
+    if branch:
+        sql += " AND w.branch = ?"
+        params.append(branch)
+    if district:
+        sql += " AND w.district = ?"
+        params.append(district)
+    if day:
+        sql += " AND w.forecast_day = ?"
+        params.append(day)
+    sql += " ORDER BY w.branch, w.id"
+    return pd.read_sql_query(sql, conn, params=params)
 
-    if summaries_list:
-        summaries_df = pd.DataFrame(summaries_list)
-        summaries_df['scraped_at'] = scraped_at_timestamp
-        cols = ['scraped_at','branch','address','latitude','longitude','district',
-                'forecast_day','summary_text']
-        summaries_df[cols].to_sql('daily_summaries', conn, if_exists='append', index=False)
+def summaries_frame(summaries_list):
+    """Summaries as a DataFrame ordered by forecast day, then branch"""
+    summaries_df = pd.DataFrame(summaries_list)
+    day_order = {"hôm nay": 1, "ngày mai": 2, "2 ngày tới": 3}
+    summaries_df["day_order"] = summaries_df["forecast_day"].map(day_order)
+    return summaries_df.sort_values(["day_order", "branch"]).drop(columns="day_order")
 
-def save_to_csv(weather_df, summaries_list):
+def save_to_csv(weather_df, summaries_list, scraped_at=None):
     """Save raw + summary to CSV files"""
-    timestamp_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    timestamp_str = (scraped_at or datetime.now()).strftime("%Y-%m-%d_%H-%M-%S")
     
     if not weather_df.empty:
         hourly_filename = os.path.join(CSV_OUTPUT_FOLDER, f"hourly_weather_{timestamp_str}.csv")
@@ -65,23 +128,25 @@ def save_to_csv(weather_df, summaries_list):
         print(f"  - Saved hourly data to {hourly_filename}")
         
     if summaries_list:
-        summaries_df = pd.DataFrame(summaries_list)
-        day_order = {"hôm nay": 1, "ngày mai": 2, "2 ngày tới": 3}
-        summaries_df["day_order"] = summaries_df["forecast_day"].map(day_order)
-        summaries_df = summaries_df.sort_values(["day_order", "branch"]).drop(columns="day_order")
+        summaries_df = summaries_frame(summaries_list)
         
         summary_filename = os.path.join(CSV_OUTPUT_FOLDER, f"rain_summaries_{timestamp_str}.csv")
         summaries_df.to_csv(summary_filename, index=False, encoding='utf-8-sig')
         print(f"  - Saved summaries to {summary_filename}")
 
+# User-visible rain wording: report lines name the strongest rain of the hours they cover
+# (src.conditions.rain_label), e.g. "Quận 1, Quận 3: Mưa vừa có dông 14h-16h." instead of a fixed
+# "Mưa dông", and rainy summaries end with "(mạnh nhất: mưa to)."
 def generate_rain_summary(df):
-    """Generate rain summary per branch/day"""
+    """Generate rain summary per branch/day, with the day's strongest rain (src.conditions)"""
     summaries = []
     if df.empty: return summaries
+    df = with_conditions(df)
     for (branch, forecast_day), group in df.groupby(['branch', 'forecast_day']):
-        rainy_hours = group[group['content'].str.contains('|'.join(RAIN_KEYWORDS), case=False, na=False)]
+        rainy_hours = group[group['rain_intensity'] > 0]
         summary = (f"Dự báo cho {branch} ({group['district'].iloc[0]}) {forecast_day}: "
-                   f"Có khả năng mưa vào các giờ: {', '.join(rainy_hours['hour'].tolist())}." 
+                   f"Có khả năng mưa vào các giờ: {', '.join(rainy_hours['hour'].tolist())} "
+                   f"(mạnh nhất: {rain_label(rainy_hours).lower()})."
                    if not rainy_hours.empty else 
                    f"Dự báo cho {branch} ({group['district'].iloc[0]}) {forecast_day}: Trời không mưa.")
         summaries.append({
@@ -104,7 +169,7 @@ def save_text_notifications(weather_df, summaries_list):
     filename = os.path.join(CSV_OUTPUT_FOLDER, f"report_notification_{timestamp_str}.txt")
 
     # Call the new dynamic report generator for today (forecast_day=1)
-    report_text = generate_dynamic_report(weather_df, RAIN_KEYWORDS, forecast_day=1)
+    report_text = generate_dynamic_report(weather_df, forecast_day=1)
     
     with open(filename, "w", encoding="utf-8") as f:
         f.write(report_text)
@@ -113,42 +178,45 @@ def save_text_notifications(weather_df, summaries_list):
 
 # --- NEW HELPER AND REPORT GENERATION FUNCTIONS ---
 
+def consecutive_hour_ranges(groups, hours):
+    """
+    Vectorized _group_consecutive_hours for many groups at once. `groups` and `hours` are parallel
+    integer arrays (one entry per hour, any order, duplicates allowed). Returns (run_groups, labels):
+    one "03h-05h" / "09h" label per run of consecutive hours, ordered by group then hour.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    hours = np.asarray(hours, dtype=np.int64)
+    order = np.lexsort((hours, groups))
+    g, h = groups[order], hours[order]
+    distinct = np.ones(len(g), dtype=bool)
+    distinct[1:] = (g[1:] != g[:-1]) | (h[1:] != h[:-1])
+    g, h = g[distinct], h[distinct]
+    if not len(g):
+        return g, np.array([], dtype=object)
+
+    new_run = np.ones(len(g), dtype=bool)
+    new_run[1:] = (g[1:] != g[:-1]) | (h[1:] != h[:-1] + 1)
+    starts = np.flatnonzero(new_run)
+    ends = np.append(starts[1:], len(g)) - 1
+    # Format each distinct (first, last) pair once; a day only has a few hundred possible ranges
+    pairs, inverse = np.unique(np.column_stack([h[starts], h[ends]]), axis=0, return_inverse=True)
+    labels = np.array([f"{a:02d}h" if a == b else f"{a:02d}h-{b:02d}h" for a, b in pairs], dtype=object)
+    return g[starts], labels[inverse.reshape(-1)]
+
 def _group_consecutive_hours(hours):
     """
     A helper function to group a list of integer hours into ranges.
     Example: [3, 4, 5, 9, 11, 12] -> ["03h-05h", "09h", "11h-12h"]
     """
-    if not hours:
+    if not len(hours):
         return []
-    
-    # Use list(set(hours)) to get unique values before sorting
-    sorted_hours = sorted(list(set(hours)))
-    ranges = []
-    start_of_range = sorted_hours[0]
-    
-    for i in range(1, len(sorted_hours)):
-        if sorted_hours[i] != sorted_hours[i-1] + 1:
-            end_of_range = sorted_hours[i-1]
-            if start_of_range == end_of_range:
-                # Use f-string formatting to ensure leading zero (e.g., 03h)
-                ranges.append(f"{start_of_range:02d}h")
-            else:
-                ranges.append(f"{start_of_range:02d}h-{end_of_range:02d}h")
-            start_of_range = sorted_hours[i]
-            
-    # Add the last range
-    end_of_range = sorted_hours[-1]
-    if start_of_range == end_of_range:
-        ranges.append(f"{start_of_range:02d}h")
-    else:
-        ranges.append(f"{start_of_range:02d}h-{end_of_range:02d}h")
-        
-    return ranges
+    _, labels = consecutive_hour_ranges(np.zeros(len(hours), dtype=np.int64), hours)
+    return labels.tolist()
 
-def generate_dynamic_report(all_weather_df, rain_keywords, forecast_day=1):
+def generate_dynamic_report(all_weather_df, forecast_day=1):
     """
-    Generates a text report by dynamically grouping districts with identical rain forecasts.
-    The largest group of rainy districts becomes "Toàn hệ thống".
+    Generates a text report by dynamically grouping districts with identical rain forecasts
+    (same rainy hours and same strongest rain). The largest group of rainy districts becomes "Toàn hệ thống".
     """
     report_parts = ["Thông báo: 📢 THÔNG BÁO DỰ BÁO THỜI TIẾT"]
     
@@ -157,16 +225,18 @@ def generate_dynamic_report(all_weather_df, rain_keywords, forecast_day=1):
     df_day = all_weather_df[all_weather_df['forecast_day'] == day_label].copy()
     if df_day.empty:
         return "Không có dữ liệu dự báo cho hôm nay."
+    df_day = with_conditions(df_day)
 
     # --- Core Dynamic Logic ---
-    # 1. Determine the rain "signature" (the exact hours of rain) for each district.
+    # 1. Determine the rain "signature" (the exact hours of rain and the strongest rain) for each district.
     forecast_groups = {}
     for district_name in df_day['district'].unique():
         df_district = df_day[df_day['district'] == district_name]
-        rainy_hours = df_district[df_district['content'].str.contains('|'.join(rain_keywords), case=False, na=False)]
+        rainy_hours = df_district[df_district['rain_intensity'] > 0]
         
-        # The signature is a sorted tuple of rainy hours, e.g., (14, 15, 19)
-        signature = tuple(sorted(rainy_hours['hour'].str.replace('h', '', regex=False).astype(int).unique()))
+        # The signature is a sorted tuple of rainy hours plus the rain label, e.g., ((14, 15, 19), "Mưa vừa")
+        hours = tuple(sorted(rainy_hours['hour'].str.replace('h', '', regex=False).astype(int).unique()))
+        signature = (hours, rain_label(rainy_hours))
         
         # Group districts by their signature
         if signature not in forecast_groups:
@@ -181,13 +251,13 @@ def generate_dynamic_report(all_weather_df, rain_keywords, forecast_day=1):
     is_first_rain_group = True
     rain_reported = False
 
-    for signature, districts in sorted_groups:
-        # Skip the "no rain" group (empty signature)
-        if not signature:
+    for (hours, rain), districts in sorted_groups:
+        # Skip the "no rain" group (no rainy hours)
+        if not hours:
             continue
         
         rain_reported = True
-        hour_ranges_str = ', '.join(_group_consecutive_hours(list(signature)))
+        hour_ranges_str = ', '.join(_group_consecutive_hours(list(hours)))
         
         # The first and largest group (with more than 1 member) is labeled "Toàn hệ thống"
         if is_first_rain_group and len(districts) > 1:
@@ -199,7 +269,7 @@ def generate_dynamic_report(all_weather_df, rain_keywords, forecast_day=1):
             cleaned_districts = [d.replace('TP ', '') for d in districts]
             label = ", ".join(cleaned_districts)
             
-        report_parts.append(f"{label}: Mưa dông {hour_ranges_str}.")
+        report_parts.append(f"{label}: {rain} {hour_ranges_str}.")
 
     if not rain_reported:
         report_parts.append("Toàn hệ thống: Trời không mưa.")
@@ -209,7 +279,7 @@ def generate_dynamic_report(all_weather_df, rain_keywords, forecast_day=1):
     
     return "\n".join(report_parts)
 
-def generate_notification_report(all_weather_df, rain_keywords, forecast_day=1):
+def generate_notification_report(all_weather_df, forecast_day=1):
     """
     Generates a formatted text report that mimics the structure of the provided image.
     """
@@ -231,21 +301,22 @@ def generate_notification_report(all_weather_df, rain_keywords, forecast_day=1):
     df_day = all_weather_df[all_weather_df['forecast_day'] == DAY_LABELS[forecast_day]].copy()
     if df_day.empty:
         return "Không có dữ liệu dự báo cho hôm nay."
+    df_day = with_conditions(df_day)
 
     # --- 1. Generate "Toàn hệ thống" Section ---
     df_system = df_day[df_day['district'].isin(SYSTEM_DISTRICTS)]
-    rainy_system = df_system[df_system['content'].str.contains('|'.join(rain_keywords), case=False, na=False)]
+    rainy_system = df_system[df_system['rain_intensity'] > 0]
     
     if not rainy_system.empty:
         system_hours = rainy_system['hour'].str.replace('h', '', regex=False).astype(int).unique()
         system_ranges = _group_consecutive_hours(list(system_hours))
-        # The image seems to use "Mưa dông" as a generic term for the system-wide summary.
-        report_parts.append(f"Toàn hệ thống: Mưa dông {', '.join(system_ranges)}.")
+        # The system-wide line names the strongest rain, e.g. "Mưa to có dông"
+        report_parts.append(f"Toàn hệ thống: {rain_label(rainy_system)} {', '.join(system_ranges)}.")
     
     # --- 2. Generate Sections for Specific Locations ---
     for district_name, details in SPECIFIC_DISTRICTS.items():
         df_loc = df_day[df_day['district'] == district_name]
-        rainy_loc = df_loc[df_loc['content'].str.contains('|'.join(rain_keywords), case=False, na=False)]
+        rainy_loc = df_loc[df_loc['rain_intensity'] > 0]
         
         if not rainy_loc.empty:
             rain_by_type_strings = []
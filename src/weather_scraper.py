@@ -6,9 +6,12 @@ import re
 import glob
 
 # --- CONFIGURATION ---
-BRANCH_CSV_PATH = 'data/branches/branches_icool.csv'
+BRANCH_CSV_PATH = os.environ.get("WEATHER_BRANCHES_FILE", 'data/branches/branches_icool.csv')
 HISTORICAL_REPORTS_FOLDER = 'data/historical_reports'
 TODAY_REPORTS_FOLDER = 'data/today_weather_data_reports'
+# Overridable to point at a local stand-in server (python -m src.standin)
+ARCHIVE_API_URL = os.environ.get("WEATHER_ARCHIVE_API_URL", "https://archive-api.open-meteo.com/v1/archive")
+FORECAST_API_URL = os.environ.get("WEATHER_FORECAST_API_URL", "https://api.open-meteo.com/v1/forecast")
 
 HISTORICAL_HOURLY_VARIABLES = [
     "temperature_2m", "relativehumidity_2m", "apparent_temperature", "precipitation",
@@ -44,7 +47,7 @@ def find_latest_file(pattern):
 # --- API FETCHING FUNCTIONS (No changes) ---
 
 def fetch_historical_weather(latitude, longitude, start_date, end_date):
-    base_url = "https://archive-api.open-meteo.com/v1/archive"
+    base_url = ARCHIVE_API_URL
     params = {"latitude": latitude, "longitude": longitude, "start_date": start_date, "end_date": end_date, "hourly": ",".join(HISTORICAL_HOURLY_VARIABLES), "timezone": "auto"}
     try:
         response = requests.get(base_url, params=params)
@@ -60,7 +63,7 @@ def fetch_historical_weather(latitude, longitude, start_date, end_date):
     return None
 
 def fetch_today_15min_weather(latitude, longitude):
-    base_url = "https://api.open-meteo.com/v1/forecast"
+    base_url = FORECAST_API_URL
     today_str = date.today().strftime("%Y-%m-%d")
     params = {"latitude": latitude, "longitude": longitude, "minutely_15": ",".join(MINUTELY_15_VARIABLES), "start_date": today_str, "end_date": today_str, "timezone": "auto"}
     try:
@@ -133,63 +136,89 @@ def analyze_precipitation_summary(df, interval_minutes):
     
     return total_precip, duration_minutes, peak_precip
 
+def compare_rainfall(branch_name, today=None):
+    """
+    Computes today's rainfall metrics for a branch and the same metrics for the comparison day.
+    Returns None when the today/historical files for the branch are missing.
+    """
+    today = today or date.today()
+    compare_date = today - timedelta(days=31)
+    s_branch_name = sanitize_filename(branch_name)
+
+    today_file = find_latest_file(os.path.join(TODAY_REPORTS_FOLDER, f'{s_branch_name}_today_*.csv'))
+    hist_file = find_latest_file(os.path.join(HISTORICAL_REPORTS_FOLDER, f'{s_branch_name}_historical_*.csv'))
+    if not today_file or not hist_file:
+        return None
+
+    # --- Analyze Today's Data ---
+    today_df = pd.read_csv(today_file)
+    today_total, today_duration, today_peak = analyze_precipitation_summary(today_df, 15)
+
+    # --- Analyze Historical Data ---
+    hist_df = pd.read_csv(hist_file)
+    hist_df['datetime'] = pd.to_datetime(hist_df['datetime'])
+    hist_day_df = hist_df[hist_df['datetime'].dt.date == compare_date]
+    hist_total, hist_duration, hist_peak = analyze_precipitation_summary(hist_day_df, 60)
+
+    return {
+        "branch": branch_name,
+        "today": today.strftime('%Y-%m-%d'),
+        "today_total_mm": float(today_total),
+        "today_duration_minutes": int(today_duration),
+        "today_peak_mm": float(today_peak),
+        "compare_date": compare_date.strftime('%Y-%m-%d'),
+        "hist_total_mm": float(hist_total),
+        "hist_duration_minutes": int(hist_duration),
+        "hist_peak_mm": float(hist_peak),
+    }
+
+def format_rainfall_comparison(result):
+    """Formats a compare_rainfall() result as the text report printed by the menu."""
+    today_duration, hist_duration = result['today_duration_minutes'], result['hist_duration_minutes']
+    lines = [
+        f"  [+] Today's Rainfall Summary ({result['today']}):",
+        f"      - Total Precipitation: {result['today_total_mm']:.2f} mm",
+        f"      - Duration of Rain:    {today_duration // 60}h {today_duration % 60}m",
+        f"      - Peak Intensity:      {result['today_peak_mm']:.2f} mm in a 15-min interval",
+        "",
+        f"  [+] Historical Summary ({result['compare_date']}):",
+        f"      - Total Precipitation: {result['hist_total_mm']:.2f} mm",
+        f"      - Duration of Rain:    {hist_duration // 60}h {hist_duration % 60}m",
+        f"      - Peak Intensity:      {result['hist_peak_mm']:.2f} mm in an hour",
+        "",
+        "  [!] Comparison Highlights:",
+    ]
+    total_diff = result['today_total_mm'] - result['hist_total_mm']
+    duration_diff = today_duration - hist_duration
+
+    if abs(total_diff) < 1.0:
+        lines.append("      - Total rainfall is similar to 60 days ago.")
+    else:
+        direction = "more" if total_diff > 0 else "less"
+        lines.append(f"      - Received {abs(total_diff):.2f} mm {direction} rainfall today.")
+
+    if abs(duration_diff) < 30:
+        lines.append("      - The duration of rain was comparable.")
+    else:
+        direction = "longer" if duration_diff > 0 else "shorter"
+        lines.append(f"      - Rain events today were significantly {direction}.")
+    return "\n".join(lines)
+
 def run_rainfall_analysis(locations_df):
     """
     Provides a detailed summary and comparison of rainfall for today vs. 60 days ago.
     """
     print("\n--- Starting Detailed Rainfall Analysis & Comparison ---")
-    today = date.today()
-    compare_date = today - timedelta(days=31)
-
     for _, row in locations_df.iterrows():
         branch_name = row['branch']
-        s_branch_name = sanitize_filename(branch_name)
         print(f"\n{'='*20} ANALYSIS FOR: {branch_name.upper()} {'='*20}")
 
-        today_file = find_latest_file(os.path.join(TODAY_REPORTS_FOLDER, f'{s_branch_name}_today_*.csv'))
-        hist_file = find_latest_file(os.path.join(HISTORICAL_REPORTS_FOLDER, f'{s_branch_name}_historical_*.csv'))
-
-        if not today_file or not hist_file:
+        result = compare_rainfall(branch_name)
+        if result is None:
             print("  [Warning] Missing data files. Please run option 3 to fetch them first.")
             continue
 
-        # --- Analyze Today's Data ---
-        today_df = pd.read_csv(today_file)
-        today_total, today_duration, today_peak = analyze_precipitation_summary(today_df, 15)
-
-        # --- Analyze Historical Data ---
-        hist_df = pd.read_csv(hist_file)
-        hist_df['datetime'] = pd.to_datetime(hist_df['datetime'])
-        hist_day_df = hist_df[hist_df['datetime'].dt.date == compare_date]
-        hist_total, hist_duration, hist_peak = analyze_precipitation_summary(hist_day_df, 60)
-
-        # --- Print Report ---
-        print(f"  [+] Today's Rainfall Summary ({today.strftime('%Y-%m-%d')}):")
-        print(f"      - Total Precipitation: {today_total:.2f} mm")
-        print(f"      - Duration of Rain:    {today_duration // 60}h {today_duration % 60}m")
-        print(f"      - Peak Intensity:      {today_peak:.2f} mm in a 15-min interval")
-
-        print(f"\n  [+] Historical Summary ({compare_date.strftime('%Y-%m-%d')}):")
-        print(f"      - Total Precipitation: {hist_total:.2f} mm")
-        print(f"      - Duration of Rain:    {hist_duration // 60}h {hist_duration % 60}m")
-        print(f"      - Peak Intensity:      {hist_peak:.2f} mm in an hour")
-
-        # --- Comparison ---
-        print("\n  [!] Comparison Highlights:")
-        total_diff = today_total - hist_total
-        duration_diff = today_duration - hist_duration
-
-        if abs(total_diff) < 1.0:
-            print("      - Total rainfall is similar to 60 days ago.")
-        else:
-            direction = "more" if total_diff > 0 else "less"
-            print(f"      - Received {abs(total_diff):.2f} mm {direction} rainfall today.")
-        
-        if abs(duration_diff) < 30:
-            print("      - The duration of rain was comparable.")
-        else:
-            direction = "longer" if duration_diff > 0 else "shorter"
-            print(f"      - Rain events today were significantly {direction}.")
+        print(format_rainfall_comparison(result))
         print(f"{'='*58}")
 
 
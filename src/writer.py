@@ -0,0 +1,211 @@
+# writer.py
+import math
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from src.utils import DB_FILE
+
+# --- CONFIGURATION ---
+WRITER_QUEUE_SIZE = 64       # pending write jobs before producers block (backpressure)
+WRITER_BATCH_SIZE = 32       # jobs committed together in one transaction
+WRITER_FLUSH_SECONDS = 0.5   # ...or whatever has arrived after this long
+WRITER_BUSY_TIMEOUT_MS = 30000  # nowcast/maintenance/events write to the same file from other processes
+WRITER_POLL_SECONDS = 0.5    # how often a blocked producer checks that the writer thread is still alive
+LATENCY_SAMPLES = 1000       # recent commit latencies kept for the metrics
+
+_STOP = object()
+
+class SQLiteWriter:
+    """
+    The only thread that writes to the database. Producers submit(write, *args) jobs onto a bounded
+    queue; the writer runs write(conn, *args) for each and commits them in batches of up to
+    `batch_size` jobs or every `flush_interval` seconds. A full queue blocks submit() until the
+    writer catches up. Jobs must not commit themselves; each runs in its own savepoint, so a
+    failing job is rolled back without losing the rest of its batch.
+
+    Use as a context manager (or call close()) so pending jobs are committed on shutdown. If the
+    writer thread dies (e.g. the DB can't be opened or BEGIN fails), submit(), flush() and close()
+    re-raise its exception instead of blocking forever.
+    """
+
+    def __init__(self, db_file=DB_FILE, max_queue=WRITER_QUEUE_SIZE, batch_size=WRITER_BATCH_SIZE,
+                 flush_interval=WRITER_FLUSH_SECONDS):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._counts = {"submitted": 0, "committed": 0, "failed": 0, "commits": 0,
+                        "blocked_submits": 0, "blocked_seconds": 0.0, "max_queue_depth": 0}
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._closed = False
+        self._error = None
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- PRODUCER SIDE ---
+
+    def submit(self, write, *args):
+        """Queues write(conn, *args); blocks while the queue is full."""
+        if self._closed:
+            raise RuntimeError("SQLiteWriter is closed")
+        self._check_alive()
+        job = (write, args)
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            started = time.perf_counter()
+            self._put(job)
+            with self._lock:
+                self._counts["blocked_submits"] += 1
+                self._counts["blocked_seconds"] += time.perf_counter() - started
+        with self._lock:
+            self._counts["submitted"] += 1
+            self._counts["max_queue_depth"] = max(self._counts["max_queue_depth"], self.queue.qsize())
+
+    def flush(self):
+        """Blocks until every job submitted so far has been committed (or has failed)."""
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                self._check_alive()
+                self.queue.all_tasks_done.wait(WRITER_POLL_SECONDS)
+
+    def close(self):
+        """Commits whatever is still queued and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            try:
+                self._put(_STOP)
+            except Exception:
+                pass            # the thread died meanwhile; its error is raised below
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _put(self, item):
+        """A blocking put that gives up, with the writer's error, if the writer thread has died."""
+        while True:
+            try:
+                self.queue.put(item, timeout=WRITER_POLL_SECONDS)
+                return
+            except queue.Full:
+                self._check_alive()
+
+    def _check_alive(self):
+        if not self._thread.is_alive():
+            if self._error is not None:
+                raise self._error
+            raise RuntimeError("SQLiteWriter thread has stopped")
+
+    def metrics(self):
+        """Queue depth, job counts, time producers spent blocked, and commit latency in ms."""
+        with self._lock:
+            stats = dict(self._counts)
+            latencies = sorted(self._latencies)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["blocked_seconds"] = round(stats["blocked_seconds"], 3)
+        if latencies:
+            stats["commit_ms_avg"] = round(1000 * sum(latencies) / len(latencies), 2)
+            # Nearest-rank percentile: with few commits it is the largest sample, never below the median
+            stats["commit_ms_p95"] = round(1000 * latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)], 2)
+            stats["commit_ms_max"] = round(1000 * latencies[-1], 2)
+        return stats
+
+    def format_metrics(self):
+        m = self.metrics()
+        text = (f"{m['committed']} jobs committed in {m['commits']} transactions, {m['failed']} failed; "
+                f"max queue depth {m['max_queue_depth']}, {m['blocked_submits']} blocked submits "
+                f"({m['blocked_seconds']}s)")
+        if "commit_ms_avg" in m:
+            text += f"; commit latency avg {m['commit_ms_avg']} ms, p95 {m['commit_ms_p95']} ms, max {m['commit_ms_max']} ms"
+        return text
+
+    # --- WRITER THREAD ---
+
+    def _next_batch(self):
+        """Waits for one job, then collects more until the batch is full or flush_interval has passed."""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while batch[-1] is not _STOP and len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        try:
+            # Autocommit mode: transactions and savepoints are issued explicitly below
+            conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False,
+                                   timeout=WRITER_BUSY_TIMEOUT_MS / 1000)
+        except Exception as e:
+            self._fail(e)
+            return
+        try:
+            conn.execute(f"PRAGMA busy_timeout={WRITER_BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode=WAL")      # readers are not blocked while a batch is written
+            conn.execute("PRAGMA synchronous=NORMAL")
+            while True:
+                batch = self._next_batch()
+                stop = batch[-1] is _STOP
+                jobs = batch[:-1] if stop else batch
+                if jobs:
+                    self._commit_batch(conn, jobs)
+                for _ in batch:
+                    self.queue.task_done()
+                if stop:
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            conn.close()
+
+    def _fail(self, error):
+        """Records the exception that stopped the writer thread; producers re-raise it."""
+        self._error = error
+        print(f"[WRITER ERROR] Writer thread stopped; pending jobs were not written. Reason: {error}")
+        with self.queue.all_tasks_done:
+            self.queue.all_tasks_done.notify_all()      # wake flush() so it sees the dead thread
+
+    def _commit_batch(self, conn, jobs):
+        started = time.perf_counter()
+        committed = failed = 0
+        # IMMEDIATE takes the write lock up front, so another process holding it is waited for
+        # (busy_timeout) instead of failing the upgrade from a read transaction
+        conn.execute("BEGIN IMMEDIATE")
+        for write, args in jobs:
+            conn.execute("SAVEPOINT job")
+            try:
+                write(conn, *args)
+                conn.execute("RELEASE job")
+                committed += 1
+            except Exception as e:
+                conn.execute("ROLLBACK TO job")
+                conn.execute("RELEASE job")
+                failed += 1
+                print(f"[WRITER ERROR] {getattr(write, '__name__', write)} failed and was rolled back. Reason: {e}")
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            print(f"[WRITER ERROR] Commit of {len(jobs)} jobs failed. Reason: {e}")
+            failed, committed = failed + committed, 0
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+            self._counts["commits"] += 1
+            self._counts["committed"] += committed
+            self._counts["failed"] += failed
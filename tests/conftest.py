@@ -0,0 +1,14 @@
+# conftest.py
+import os
+import sys
+
+import pytest
+
+# The tests import the flat src package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty working directory; relative paths (DB_FILE, report and archive folders) resolve inside it."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,70 @@
+# test_alerts.py
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from src.alerts import evaluate_alerts, forecast_frame, load_rules
+from src.writer import SQLiteWriter
+
+RULES = load_rules()
+
+def _forecast(branches=("A", "B"), days=("hôm nay", "ngày mai"), temperature="36°"):
+    return pd.DataFrame([
+        {"branch": b, "district": "Quận 1", "forecast_day": d, "hour": f"{h:02d}", "temperature": temperature,
+         "content": "Nắng", "wind": "B 5 km/h", "humidity": "60%", "uv_index": "5 (Trung bình)"}
+        for b in branches for d in days for h in range(12, 15)
+    ])
+
+@pytest.fixture
+def evaluate(tmp_path):
+    """evaluate(weather_df) -> (alerts, groups, re-evaluated), committed before returning."""
+    db_file = str(tmp_path / "a.db")
+    def run(weather_df):
+        with SQLiteWriter(db_file) as writer, closing(sqlite3.connect(db_file)) as conn:
+            return evaluate_alerts(conn, "forecast", forecast_frame(weather_df), RULES, writer)
+    run.db_file = db_file
+    return run
+
+def _stored(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return sorted(conn.execute("SELECT branch, period, rule FROM alerts"))
+
+def test_unchanged_input_is_not_evaluated_again(evaluate):
+    alerts, groups, changed = evaluate(_forecast())
+    assert (groups, changed) == (4, 4)
+    assert set(alerts["rule"]) == {"high_temperature"} and len(alerts) == 4
+    assert evaluate(_forecast())[1:] == (4, 0)
+    assert len(_stored(evaluate.db_file)) == 4
+
+def test_only_the_changed_group_is_evaluated(evaluate):
+    evaluate(_forecast())
+    df = _forecast()
+    df.loc[(df["branch"] == "B") & (df["forecast_day"] == "ngày mai"), "temperature"] = "30°"
+    alerts, groups, changed = evaluate(df)
+    assert (groups, changed) == (4, 1) and alerts.empty
+    assert ("B", "ngày mai", "high_temperature") not in _stored(evaluate.db_file)
+    assert len(_stored(evaluate.db_file)) == 3
+
+def test_reordered_rows_keep_their_fingerprints(evaluate):
+    evaluate(_forecast())
+    assert evaluate(_forecast().iloc[::-1])[1:] == (4, 0)
+
+def test_branches_with_identical_rows_are_separate_groups(evaluate):
+    evaluate(_forecast(days=("hôm nay",)))
+    df = _forecast(days=("hôm nay",))
+    df.loc[df["branch"] == "A", "temperature"] = "30°"
+    assert evaluate(df)[1:] == (2, 1)
+
+def test_duplicated_rows_change_the_fingerprint(evaluate):
+    evaluate(_forecast(branches=("A",), days=("hôm nay",)))
+    df = _forecast(branches=("A",), days=("hôm nay",))
+    assert evaluate(pd.concat([df, df.iloc[:2]], ignore_index=True))[1:] == (1, 1)
+
+def test_dropped_branch_loses_its_alerts(evaluate):
+    evaluate(_forecast())
+    assert evaluate(_forecast(branches=("A",)))[1:] == (2, 0)
+    assert {branch for branch, _, _ in _stored(evaluate.db_file)} == {"A"}
+    with sqlite3.connect(evaluate.db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM alert_inputs").fetchone()[0] == 2
@@ -0,0 +1,91 @@
+# test_api.py
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.api import BadRequest, TTLCache, _day_code, create_server
+from src.utils import DB_FILE, setup_database_and_folders
+
+# --- CACHE ---
+
+def test_cache_entries_expire_after_ttl():
+    cache = TTLCache(ttl=0.05)
+    cache.set("k", b"v")
+    assert cache.get("k") == b"v"
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_cache_checks_version_at_most_once_per_interval():
+    calls = []
+    cache = TTLCache(version_check=60)
+    for _ in range(100):
+        cache.sync_version(lambda: calls.append(1) or 1)
+    assert len(calls) == 1
+
+def test_cache_is_cleared_when_version_changes():
+    version = {"v": 1}
+    cache = TTLCache(version_check=0)
+    cache.sync_version(lambda: version["v"])
+    cache.set("k", b"v")
+    cache.sync_version(lambda: version["v"])
+    assert cache.get("k") == b"v"
+    version["v"] = 2
+    cache.sync_version(lambda: version["v"])
+    assert cache.get("k") is None
+
+# --- PARAMETERS ---
+
+def test_day_accepts_codes_and_labels():
+    assert _day_code(None) is None
+    assert _day_code("2") == 2
+    assert _day_code("hôm nay") == 1
+
+@pytest.mark.parametrize("day", ["0", "4", "x", "-1", ""])
+def test_invalid_day_is_bad_request(day):
+    with pytest.raises(BadRequest):
+        _day_code(day)
+
+# --- SERVER ---
+
+@pytest.fixture
+def server(workdir):
+    setup_database_and_folders()
+    server = create_server(port=0, db_file=str(workdir / DB_FILE))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_invalid_day_returns_400(server):
+    status, body = _get(f"{server}/report?day=4")
+    assert status == 400
+    assert "Invalid day" in body["error"]
+
+def test_report_and_health(server):
+    assert _get(f"{server}/report?day=1")[0] == 200
+    assert _get(f"{server}/report")[0] == 200
+    assert _get(f"{server}/unknown")[0] == 404
+    status, body = _get(f"{server}/health")
+    assert status == 200 and body["cache"]["entries"] == 2
@@ -0,0 +1,81 @@
+# test_backfill.py
+import sqlite3
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.backfill as backfill
+from src.backfill import CHUNK_EPOCH, RateLimiter, plan_chunks, run_backfill
+from src.weather_scraper import HISTORICAL_HOURLY_VARIABLES
+
+LOCATIONS = pd.DataFrame({"branch": ["A", "B"], "latitude": [10.77, 10.80], "longitude": [106.70, 106.65]})
+
+# --- PLANNING ---
+
+def test_chunks_cover_the_range_without_gaps():
+    chunks = plan_chunks(date(2024, 1, 15), date(2024, 12, 31), chunk_days=90)
+    assert chunks[0][0] == "2024-01-15" and chunks[-1][1] == "2024-12-31"
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert (date.fromisoformat(start) - date.fromisoformat(end)).days == 1
+
+def test_aligned_chunks_stay_the_same_as_the_end_moves():
+    before = plan_chunks(date(2024, 1, 15), date(2024, 12, 31), chunk_days=90)
+    after = plan_chunks(date(2024, 1, 15), date(2025, 1, 20), chunk_days=90)
+    assert before[:-1] == after[:len(before) - 1]
+    for start, _ in before[1:]:
+        assert (date.fromisoformat(start) - CHUNK_EPOCH).days % 90 == 0
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        RateLimiter(0)
+
+# --- RESUME ---
+
+def _history(start, end, null_from=None):
+    times = pd.date_range(start, pd.Timestamp(end) + pd.Timedelta(hours=23), freq="h")
+    df = pd.DataFrame({v: np.ones(len(times)) for v in HISTORICAL_HOURLY_VARIABLES})
+    if null_from is not None:
+        df.loc[times >= pd.Timestamp(null_from), HISTORICAL_HOURLY_VARIABLES] = np.nan
+    return df.assign(datetime=times, weather_condition="Rain")
+
+def _checkpoints(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return sorted(conn.execute("SELECT branch, chunk_start, chunk_end FROM backfill_chunks").fetchall())
+
+def test_failed_chunks_are_retried_and_completed_ones_skipped(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "b.db")
+    calls, failing = [], {"on": True}
+    def fetch(lat, lon, start, end):
+        calls.append((lat, start))
+        if failing["on"] and lat == 10.80 and start == "2024-03-02":
+            raise ConnectionError("reset by peer")
+        return _history(start, end)
+    monkeypatch.setattr(backfill, "fetch_historical_weather", fetch)
+
+    run_backfill(LOCATIONS, date(2024, 3, 2), date(2024, 6, 30), db_file, chunk_days=91, rate=1000)
+    assert len(calls) == 4 and len(_checkpoints(db_file)) == 3
+    failing["on"] = False
+    run_backfill(LOCATIONS, date(2024, 3, 2), date(2024, 6, 30), db_file, chunk_days=91, rate=1000)
+    assert calls[4:] == [(10.80, "2024-03-02")]
+    assert len(_checkpoints(db_file)) == 4
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM historical_hourly").fetchone()[0] == 2 * 121 * 24
+
+def test_chunk_ending_in_nulls_is_stored_but_not_checkpointed(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "b.db")
+    monkeypatch.setattr(backfill, "fetch_historical_weather",
+                        lambda lat, lon, start, end: _history(start, end, null_from="2024-06-28"))
+    run_backfill(LOCATIONS.head(1), date(2024, 4, 1), date(2024, 6, 30), db_file, chunk_days=91, rate=1000)
+    assert _checkpoints(db_file) == [("A", "2024-04-01", "2024-05-31")]
+
+    calls = []
+    def fetch(lat, lon, start, end):
+        calls.append(start)
+        return _history(start, end)
+    monkeypatch.setattr(backfill, "fetch_historical_weather", fetch)
+    run_backfill(LOCATIONS.head(1), date(2024, 4, 1), date(2024, 6, 30), db_file, chunk_days=91, rate=1000)
+    assert calls == ["2024-06-01"] and len(_checkpoints(db_file)) == 2
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM historical_hourly WHERE precipitation IS NULL").fetchone()[0] == 0
@@ -0,0 +1,71 @@
+# test_delta.py
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from src.delta import change_rows, changed_days, ingest_changes, version_branch_forecast
+from src.utils import DB_FILE, generate_rain_summary, query_latest_forecast, setup_database_and_folders
+
+BRANCHES = pd.DataFrame({
+    "branch": ["A"], "address": ["1 Đường X, Quận 1"], "latitude": [10.77], "longitude": [106.70], "district": ["Quận 1"],
+})
+
+def _rows(content="Mưa rào"):
+    return [{"hour": f"{h:02d}", "temperature": "30°", "content": content, "wind": "B 5 km/h",
+             "humidity": "80%", "uv_index": "3 (Thấp)"} for h in range(3)]
+
+def _not_parsed():
+    raise AssertionError("an unchanged page must not be parsed")
+
+@pytest.fixture
+def conn(workdir):
+    setup_database_and_folders()
+    with sqlite3.connect(DB_FILE) as conn:
+        yield conn
+
+def _scrape(conn, day_sources, scraped_at):
+    batch, versions = version_branch_forecast(conn, BRANCHES.iloc[0], day_sources, scraped_at)
+    df = batch.to_frame(BRANCHES)
+    ingest_changes(conn, *change_rows(df, generate_rain_summary(df), versions, scraped_at))
+    conn.commit()
+    return versions
+
+def _count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def test_unchanged_page_is_not_parsed_or_stored_again(conn):
+    first = datetime.now().replace(hour=8, minute=0)
+    assert changed_days(_scrape(conn, {1: ("p1", _rows)}, first)) == {"hôm nay"}
+    versions = _scrape(conn, {1: ("p1", _not_parsed)}, first + timedelta(minutes=30))
+    assert changed_days(versions) == set()
+    assert versions[0]["data_scraped_at"].startswith(first.strftime("%Y-%m-%d %H:%M"))
+    assert _count(conn, "weather_data") == 3
+    assert _count(conn, "forecast_versions") == 2
+
+def test_new_page_with_same_content_is_unchanged(conn):
+    first = datetime.now().replace(hour=8, minute=0)
+    _scrape(conn, {1: ("p1", _rows)}, first)
+    assert changed_days(_scrape(conn, {1: ("p2", _rows)}, first + timedelta(minutes=30))) == set()
+    assert _count(conn, "weather_data") == 3
+
+def test_changed_content_stores_only_that_day(conn):
+    first = datetime.now().replace(hour=8, minute=0)
+    _scrape(conn, {1: ("p1", _rows), 2: ("q1", _rows)}, first)
+    versions = _scrape(conn, {1: ("p2", lambda: _rows("Nắng")), 2: ("q1", _not_parsed)}, first + timedelta(minutes=30))
+    assert changed_days(versions) == {"hôm nay"}
+    assert _count(conn, "weather_data") == 9
+    latest = query_latest_forecast(conn)
+    assert set(latest[latest["forecast_day"] == "hôm nay"]["content"]) == {"Nắng"}
+
+def test_unparseable_day_is_skipped(conn):
+    def broken():
+        raise IndexError("list index out of range")
+    versions = _scrape(conn, {1: ("p1", broken), 2: ("q1", _rows)}, datetime.now())
+    assert [v["forecast_day"] for v in versions] == ["ngày mai"]
+
+def test_latest_forecast_ignores_other_dates(conn):
+    _scrape(conn, {1: ("p1", _rows)}, datetime.now())
+    assert len(query_latest_forecast(conn)) == 3
+    assert query_latest_forecast(conn, today=date.today() + timedelta(days=1)).empty
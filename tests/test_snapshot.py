@@ -0,0 +1,78 @@
+# test_snapshot.py
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tarfile
+
+import pytest
+
+from src.snapshot import DB_ARCNAME, MANIFEST_NAME, create_snapshot, restore_snapshot
+
+DB = "state.db"
+SNAPSHOT = os.path.join("state", "snap.tar.gz")
+
+def _make_state():
+    with sqlite3.connect(DB) as conn:
+        conn.execute("CREATE TABLE forecast_versions (page_hash TEXT)")
+        conn.executemany("INSERT INTO forecast_versions VALUES (?)", [("a",), ("b",)])
+    os.makedirs("archive")
+    with open(os.path.join("archive", "weather_data_2024-01.csv.gz"), "wb") as f:
+        f.write(b"archived rows")
+
+def _rows(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return sorted(r[0] for r in conn.execute("SELECT page_hash FROM forecast_versions"))
+
+def _write_tar(path, files, manifest_files=None):
+    """A snapshot with the given {arcname: bytes}; the manifest lists `manifest_files` (default: the real checksums)."""
+    if manifest_files is None:
+        manifest_files = {name: {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()} for name, data in files.items()}
+    manifest = {"format_version": 1, "created_at": "2024-01-01 00:00:00", "db_file": DB, "tables": {},
+                "files": manifest_files}
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in [(MANIFEST_NAME, json.dumps(manifest).encode())] + list(files.items()):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+def test_round_trip_restores_db_and_archive(workdir):
+    _make_state()
+    manifest = create_snapshot(db_file=DB, snapshot_file=SNAPSHOT)
+    assert manifest["tables"] == {"forecast_versions": 2}
+    assert set(manifest["files"]) == {DB_ARCNAME, "archive/weather_data_2024-01.csv.gz"}
+
+    os.remove(DB)
+    os.remove(os.path.join("archive", "weather_data_2024-01.csv.gz"))
+    assert restore_snapshot(snapshot_file=SNAPSHOT, db_file=DB)["tables"] == {"forecast_versions": 2}
+    assert _rows(DB) == ["a", "b"]
+    with open(os.path.join("archive", "weather_data_2024-01.csv.gz"), "rb") as f:
+        assert f.read() == b"archived rows"
+
+def test_restore_keeps_existing_db_when_asked(workdir):
+    _make_state()
+    create_snapshot(db_file=DB, snapshot_file=SNAPSHOT)
+    with sqlite3.connect(DB) as conn:
+        conn.execute("INSERT INTO forecast_versions VALUES ('c')")
+    assert restore_snapshot(snapshot_file=SNAPSHOT, db_file=DB, if_missing=True) is None
+    assert _rows(DB) == ["a", "b", "c"]
+    assert restore_snapshot(snapshot_file="missing.tar.gz", db_file=DB) is None
+
+def test_checksum_mismatch_is_refused_before_anything_is_replaced(workdir):
+    _make_state()
+    _write_tar("bad.tar.gz", {DB_ARCNAME: b"not a database"},
+               {DB_ARCNAME: {"size": 14, "sha256": hashlib.sha256(b"something else").hexdigest()}})
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        restore_snapshot(snapshot_file="bad.tar.gz", db_file=DB)
+    assert _rows(DB) == ["a", "b"]
+
+@pytest.mark.parametrize("name", ["../escaped.txt", "archive/../../escaped.txt", "/tmp/escaped.txt"])
+def test_entries_outside_the_working_directory_are_refused(workdir, name):
+    (workdir / "inner").mkdir()
+    os.chdir(workdir / "inner")
+    _write_tar("evil.tar.gz", {name: b"payload"})
+    with pytest.raises(ValueError, match="Refusing"):
+        restore_snapshot(snapshot_file="evil.tar.gz", db_file=DB)
+    assert not (workdir / "escaped.txt").exists()
+    assert not os.path.exists(DB)
@@ -0,0 +1,84 @@
+# test_writer.py
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils import sql_rows
+from src.writer import SQLiteWriter
+
+def _create(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS t (x INTEGER NOT NULL)")
+
+def _insert(conn, x):
+    conn.execute("INSERT INTO t VALUES (?)", (x,))
+
+def _values(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return sorted(x for (x,) in conn.execute("SELECT x FROM t"))
+
+def _finishes(call, timeout=10):
+    """Runs call() in a thread; returns (finished in time, exception raised or None)."""
+    result = {}
+    def run():
+        try:
+            call()
+        except Exception as e:
+            result["error"] = e
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), result.get("error")
+
+def test_failing_job_is_rolled_back_alone(tmp_path):
+    db_file = str(tmp_path / "w.db")
+    with SQLiteWriter(db_file) as writer:
+        writer.submit(_create)
+        writer.submit(_insert, 1)
+        writer.submit(_insert, None)        # NOT NULL violation, in the same batch
+        writer.submit(_insert, 2)
+        writer.flush()
+        metrics = writer.metrics()
+    assert _values(db_file) == [1, 2]
+    assert metrics["committed"] == 3 and metrics["failed"] == 1
+
+def test_close_commits_pending_jobs(tmp_path):
+    db_file = str(tmp_path / "w.db")
+    writer = SQLiteWriter(db_file, flush_interval=60)
+    writer.submit(_create)
+    for x in range(100):
+        writer.submit(_insert, x)
+    writer.close()
+    assert _values(db_file) == list(range(100))
+    with pytest.raises(RuntimeError):
+        writer.submit(_insert, 1)
+
+def test_dead_writer_raises_instead_of_hanging(tmp_path):
+    writer = SQLiteWriter(str(tmp_path / "missing" / "w.db"), max_queue=1)
+    writer._thread.join(10)
+    assert _finishes(lambda: [writer.submit(_insert, x) for x in range(5)]) == (True, writer._error)
+    assert isinstance(writer._error, sqlite3.OperationalError)
+    finished, error = _finishes(writer.close)
+    assert finished and error is writer._error
+
+def test_writer_dying_mid_run_unblocks_producers(tmp_path, monkeypatch):
+    def fail(self, conn, jobs):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(SQLiteWriter, "_commit_batch", fail)
+    writer = SQLiteWriter(str(tmp_path / "w.db"), max_queue=1, flush_interval=0)
+    def produce():
+        for x in range(10):
+            writer.submit(_insert, x)
+        writer.flush()
+    finished, error = _finishes(produce)
+    assert finished and isinstance(error, sqlite3.OperationalError)
+    assert _finishes(writer.close)[0]
+
+def test_sql_rows_are_plain_python_values():
+    df = pd.DataFrame({"i": np.array([1, 2], dtype=np.int8), "f": [1.5, np.nan], "s": ["a", None],
+                       "c": pd.Categorical(["x", "y"])})
+    rows = sql_rows(df, ["i", "f", "s", "c"])
+    assert rows == [(1, 1.5, "a", "x"), (2, None, None, "y")]
+    assert type(rows[0][0]) is int